@@ -0,0 +1,79 @@
+{#
+  Factor column used to price trips, chosen with the co2_factor_basis var:
+  'combined' (default, co2_grams_per_mile from the CSV), 'city' or 'highway'.
+#}
+{% macro co2_factor_column(basis=none) %}
+  {%- set basis = basis or var('co2_factor_basis', 'combined') -%}
+  {%- if basis == 'combined' -%}
+    co2_grams_per_mile
+  {%- elif basis in ('city', 'highway') -%}
+    co2_grams_per_mile_{{ basis }}
+  {%- else -%}
+    {{ exceptions.raise_compiler_error("Unknown co2_factor_basis: " ~ basis) }}
+  {%- endif -%}
+{% endmacro %}
+
+{#
+  vehicle type of a trip, from the vehicle_types var in dbt_project.yml: one per taxi
+  type, or for fleets of several companies (fhvhv) one per vendor_id
+#}
+{% macro vehicle_type(taxi_type, vendor_id) %}
+  CASE
+    {%- for taxi, vehicle in var('vehicle_types').items() %}
+    {%- if vehicle is mapping %}
+    {%- for vendor, vendor_vehicle in vehicle.items() %}
+    WHEN CAST({{ taxi_type }} AS VARCHAR) = '{{ taxi }}' AND {{ vendor_id }} = {{ vendor }} THEN '{{ vendor_vehicle }}'
+    {%- endfor %}
+    {%- else %}
+    WHEN CAST({{ taxi_type }} AS VARCHAR) = '{{ taxi }}' THEN '{{ vehicle }}'
+    {%- endif %}
+    {%- endfor %}
+  END
+{% endmacro %}
+
+{# join condition matching a trip to the factor version in effect at pickup #}
+{% macro emission_factor_join(factors, vehicle_type, pickup) %}
+  {{ factors }}.vehicle_type = {{ vehicle_type }}
+  AND {{ pickup }} >= {{ factors }}.effective_from
+  AND {{ pickup }} < {{ factors }}.effective_to
+{% endmacro %}
+
+{#
+  Version of the trip prices: md5 of the factor basis, the vehicle_types var and the
+  factor rows (a relation or CTE without the factor_version column). load_manifest
+  records the version each month was transformed with, so a changed CSV, basis or
+  vehicle_types mapping transforms every month again (see macros/manifest_months.sql).
+#}
+{% macro factor_version(factors, basis=none) %}
+  md5(concat_ws('|',
+    '{{ basis or var('co2_factor_basis', 'combined') }}',
+    '{{ tojson(var('vehicle_types')) }}',
+    (SELECT string_agg(CAST(f AS VARCHAR), '|' ORDER BY CAST(f AS VARCHAR)) FROM {{ factors }} AS f)
+  ))
+{% endmacro %}
+
+{#
+  Reprice trip_co2_kgs of the already transformed trips in place from the current
+  emission_factors, without rereading the cleaned trips, and restamp the repriced months
+  in load_manifest (transformed_at, factor_version) so export.py and od_matrix.py pick
+  them up:
+    dbt run --select emission_factors
+    dbt run-operation reprice_trip_co2 --args '{basis: city}'
+    dbt run --select co2_cube_hourly --vars '{co2_factor_basis: city}'
+  Later incremental runs should pass the same basis: --vars '{co2_factor_basis: city}'
+#}
+{% macro reprice_trip_co2(basis=none) %}
+  {% set sql %}
+    UPDATE {{ ref('trips_transformed') }} AS t
+    SET trip_co2_kgs = CAST(t.trip_distance AS DOUBLE) * f.{{ co2_factor_column(basis) }} / 1000.0
+    FROM {{ ref('emission_factors') }} AS f
+    WHERE {{ emission_factor_join('f', 't.vehicle_type', 't.pickup_datetime') }};
+
+    UPDATE load_manifest
+    SET transformed_at = now(),
+      factor_version = {{ factor_version("(SELECT * EXCLUDE (factor_version) FROM " ~ ref('emission_factors') ~ ")", basis) }}
+    WHERE transformed_at >= cleaned_at
+  {% endset %}
+  {% do run_query(sql) %}
+  {% do log("Repriced trip_co2_kgs in trips_transformed", info=True) %}
+{% endmacro %}
@@ -0,0 +1,55 @@
+{#
+  (taxi_type, source_month) pairs that still need transforming: cleaned, and either never
+  transformed, cleaned again since, or priced with other emission factors than the current
+  ones (factor_version, see load_manifest in scripts/load.py).
+  A full refresh transforms every cleaned month.
+#}
+{% macro months_to_transform() %}
+  SELECT taxi_type, source_month
+  FROM load_manifest
+  WHERE cleaned_at IS NOT NULL
+    {% if is_incremental() %}
+    AND (
+      transformed_at IS NULL OR transformed_at < cleaned_at
+      OR factor_version IS DISTINCT FROM {{ current_factor_version() }}
+    )
+    {% endif %}
+    {{ transform_months_filter() }}
+{% endmacro %}
+
+{# factor_version of the current emission_factors and co2_factor_basis #}
+{% macro current_factor_version() %}
+  {{ factor_version("(SELECT * EXCLUDE (factor_version) FROM " ~ ref('emission_factors') ~ ")") }}
+{% endmacro %}
+
+{#
+  post-hook recording that the months of the run have been transformed, and with which
+  factors; on a full refresh that is every cleaned month
+#}
+{% macro mark_transformed() %}
+  UPDATE load_manifest
+  SET transformed_at = now(), factor_version = {{ current_factor_version() }}
+  WHERE list_contains(
+    (SELECT list(taxi_type || '/' || source_month) FROM ({{ months_to_transform() }})),
+    taxi_type || '/' || source_month
+  )
+{% endmacro %}
+
+{# pre-hook adding factor_version to manifests created before it was recorded #}
+{% macro add_factor_version() %}
+  ALTER TABLE load_manifest ADD COLUMN IF NOT EXISTS factor_version VARCHAR
+{% endmacro %}
+
+{#
+  With --vars '{transform_months: ["yellow/2024-01", ...]}' a run only transforms those
+  months, so a small memory budget can work through the year a month at a time
+#}
+{% macro transform_months_filter() %}
+  {%- set months = var('transform_months', []) -%}
+  {%- if months %}
+    AND list_contains(
+      [{% for month in months %}'{{ month }}'{% if not loop.last %}, {% endif %}{% endfor %}],
+      taxi_type || '/' || source_month
+    )
+  {%- endif %}
+{% endmacro %}
@@ -0,0 +1,16 @@
+{#
+  DuckDB resource profile from the same environment variables as scripts/resources.py,
+  applied at the start of every dbt run (on-run-start in dbt_project.yml)
+#}
+{% macro resource_profile() %}
+  {%- set settings = {
+    'memory_limit': env_var('DUCKDB_MEMORY_LIMIT', ''),
+    'threads': env_var('DUCKDB_THREADS', ''),
+    'temp_directory': env_var('DUCKDB_TEMP_DIRECTORY', ''),
+    'preserve_insertion_order': env_var('DUCKDB_PRESERVE_INSERTION_ORDER', ''),
+  } -%}
+  {%- for name, value in settings.items() if value %}
+  SET {{ name }} = '{{ value }}';
+  {%- endfor %}
+  SELECT 1;
+{% endmacro %}
@@ -0,0 +1,20 @@
+{{ config(materialized='table') }}
+
+-- CO2 cube served by scripts/serve.py: one row per taxi type, pickup date and hour.
+-- Every grain the service answers (hour, day of week, week, month) and any date range
+-- roll up from these rows (~8.8k per fleet and year) instead of the trips. Rebuilt in
+-- full on each run: it is one GROUP BY over the transformed trips.
+SELECT
+  CAST(taxi_type AS VARCHAR) AS taxi_type,
+  CAST(pickup_datetime AS DATE) AS pickup_date,
+  hour_of_day,
+  day_of_week,
+  week_of_year,
+  month_of_year,
+  COUNT(*) AS trips,
+  SUM(trip_distance) AS total_miles,
+  SUM(trip_co2_kgs) AS total_kg,
+  MAX(trip_co2_kgs) AS max_kg
+FROM {{ ref('trips_transformed') }}
+GROUP BY ALL
+ORDER BY taxi_type, pickup_date, hour_of_day
@@ -0,0 +1,42 @@
+{{ config(materialized='table') }}
+
+-- Emission factor dimension: one row per vehicle type and effective date range.
+-- vehicle_emissions may carry several versions of a vehicle type's factors with
+-- effective_from/effective_to dates (see scripts/load.py); trips are priced with the
+-- version in effect at pickup.
+--
+-- City and highway factors are derived from the CSV itself: co2_grams_per_mile is the
+-- combined (55% city / 45% highway) figure, which gives the CO2 per gallon burned.
+--
+-- factor_version identifies the factors, basis and vehicle types trips are priced with
+-- (see macros/emission_factors.sql).
+WITH factors AS (
+  SELECT
+    vehicle_type,
+    fuel_type,
+    CAST(effective_from AS TIMESTAMP) AS effective_from,
+    CAST(effective_to AS TIMESTAMP) AS effective_to,
+    mpg_city,
+    mpg_highway,
+    co2_grams_per_mile,
+    co2_grams_per_mile / (0.55 / mpg_city + 0.45 / mpg_highway) AS co2_grams_per_gallon
+  FROM vehicle_emissions
+),
+
+priced AS (
+  SELECT
+    vehicle_type,
+    fuel_type,
+    effective_from,
+    effective_to,
+    mpg_city,
+    mpg_highway,
+    co2_grams_per_gallon,
+    co2_grams_per_mile,
+    co2_grams_per_gallon / mpg_city AS co2_grams_per_mile_city,
+    co2_grams_per_gallon / mpg_highway AS co2_grams_per_mile_highway
+  FROM factors
+)
+
+SELECT *, {{ factor_version('priced') }} AS factor_version
+FROM priced
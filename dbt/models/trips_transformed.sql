@@ -0,0 +1,39 @@
+{{
+  config(
+    materialized='incremental',
+    incremental_strategy='delete+insert',
+    unique_key=['taxi_type', 'source_month'],
+    pre_hook="{{ add_factor_version() }}",
+    post_hook="{{ mark_transformed() }}"
+  )
+}}
+
+-- one partition per taxi type (fleet) and pickup file month: a rerun only rebuilds months cleaned since the last run
+SELECT
+  t.*,
+
+  -- vehicle type used to look up emission factors
+  {{ vehicle_type('t.taxi_type', 't.vendor_id') }} AS vehicle_type,
+
+  -- 1) CO2 kg = trip_distance * co2_grams_per_mile / 1000, with the factor in effect at pickup
+  CAST(t.trip_distance AS DOUBLE) * f.{{ co2_factor_column() }} / 1000.0 AS trip_co2_kgs,
+
+  -- 2) avg mph = trip_distance / trip_duration
+  CAST(CASE
+    WHEN date_diff('second', t.pickup_datetime, t.dropoff_datetime) = 0
+        THEN NULL
+    ELSE t.trip_distance / (date_diff('second', t.pickup_datetime, t.dropoff_datetime) / 3600.0)  -- trip_duration in hours
+  END AS FLOAT) AS avg_mph,
+
+  -- 3-6) time parts from pickup
+  CAST(EXTRACT(HOUR FROM t.pickup_datetime) AS TINYINT) AS hour_of_day,
+  CAST(EXTRACT(DOW FROM t.pickup_datetime) AS TINYINT) AS day_of_week, -- 0=Sun,...,6=Sat
+  CAST(EXTRACT(WEEK FROM t.pickup_datetime) AS TINYINT) AS week_of_year,
+  CAST(EXTRACT(MONTH FROM t.pickup_datetime) AS TINYINT) AS month_of_year
+
+FROM trips AS t
+JOIN ({{ months_to_transform() }}) AS m
+  ON m.taxi_type = CAST(t.taxi_type AS VARCHAR)
+  AND m.source_month = t.source_month
+LEFT JOIN {{ ref('emission_factors') }} AS f
+  ON {{ emission_factor_join('f', vehicle_type('t.taxi_type', 't.vendor_id'), 't.pickup_datetime') }}
@@ -1,200 +1,386 @@
-import duckdb
+import argparse
 import logging
-import matplotlib.pyplot as plt
+import os
+from statistics import NormalDist
+
+import numpy as np
+
+import charts
+import fleets
+import instrument
+import od_matrix
+import query_cache
 
-logging.basicConfig(
-    level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s',
-    filename='logs/analysis.log'
-)
 logger = logging.getLogger(__name__)
 
-def analyze_parquet_files():
+# Transformed model with the trips of every configured year and fleet
+TRANSFORMED = "trips_transformed"
+
+# Time grains answered from the rollup, keyed by the transformed column they group on
+GRAINS = {
+    "hour": "hour_of_day",
+    "dow": "day_of_week",
+    "week": "week_of_year",
+    "month": "month_of_year",
+}
+
+# --approx quick look (override with environment variables)
+# - APPROX_SAMPLE_ROWS: about how many trips the block sample holds (the whole table when it is smaller)
+# DuckDB's system sampling keeps or skips whole vectors of VECTOR_SIZE rows, so the
+# APPROX_CONFIDENCE intervals treat each vector as one sample: with m vectors in a period
+# they are Student t intervals with m - 1 degrees of freedom
+APPROX_SAMPLE_ROWS = int(os.environ.get("APPROX_SAMPLE_ROWS", "1000000"))
+APPROX_CONFIDENCE = 0.95
+VECTOR_SIZE = 2048
+
+# TLC taxi zones are numbered 1-265
+TLC_ZONES = 265
+
+DOW = ["Sun","Mon","Tue","Wed","Thu","Fri","Sat"]
+
+# Charts of the report, saved as REPORT_DIR/<name>.png (override with REPORT_DIR) and
+# rendered side by side in worker processes (see charts.py):
+# - lines: value (total_kg, avg_kg or max_kg) per period of a rollup grain, one line per fleet
+# - od_heatmap: CO2 per pickup x dropoff zone from the OD matrix, one chart (<name>_<fleet>) per fleet
+REPORT_DIR = os.environ.get("REPORT_DIR", "output")
+REPORT = [
+    {"name": "co2_by_month", "kind": "lines", "grain": "month", "value": "total_kg",
+     "title": "Total CO2 by Month", "xlabel": "Month (1–12)", "ylabel": "Total CO2 (kg)"},
+    {"name": "co2_by_hour", "kind": "lines", "grain": "hour", "value": "avg_kg",
+     "title": "Average CO2 per Trip by Hour", "xlabel": "Hour of day (0–23)", "ylabel": "Avg CO2 per trip (kg)"},
+    {"name": "co2_by_dow", "kind": "lines", "grain": "dow", "value": "avg_kg", "xticklabels": DOW,
+     "title": "Average CO2 per Trip by Day of Week", "xlabel": "Day of week", "ylabel": "Avg CO2 per trip (kg)"},
+    {"name": "co2_od", "kind": "od_heatmap", "title": "CO2 by Pickup and Dropoff Zone"},
+]
+
+def co2_rollup(con):
     """
-    Prints 6 analysis results for YELLOW and GREEN and saves a PNG plot: 
-    output/co2_by_month.png
+    Compute sum/avg/count/max of trip_co2_kgs for every taxi type x grain in one scan of
+    the transformed trips, using GROUPING SETS, as NumPy columns (fetchnumpy) taxi_type,
+    grain, period, total_kg, avg_kg, trips and max_kg, one entry per row:
+    - grain 'year' is the whole year per taxi type (period NULL, masked)
+    - grains 'hour', 'dow', 'week', 'month' have one row per period
+    The columns come from the query cache (query_cache.py) unless the transformed trips
+    changed since they were last computed.
     """
-    con = None
+    grain_case = " ".join(
+        f"WHEN GROUPING({column}) = 0 THEN '{grain}'" for grain, column in GRAINS.items()
+    )
+    grouping_sets = ", ".join(
+        ["(taxi_type)"] + [f"(taxi_type, {column})" for column in GRAINS.values()]
+    )
+
+    rollup = query_cache.cached_query(con, f"""
+        SELECT
+            CAST(taxi_type AS VARCHAR) AS taxi_type,
+            CASE {grain_case} ELSE 'year' END AS grain,
+            CAST(COALESCE({', '.join(GRAINS.values())}) AS INTEGER) AS period,
+            SUM(trip_co2_kgs) AS total_kg,
+            AVG(trip_co2_kgs) AS avg_kg,
+            COUNT(*) AS trips,
+            MAX(trip_co2_kgs) AS max_kg
+        FROM {TRANSFORMED}
+        GROUP BY GROUPING SETS ({grouping_sets});
+    """, [TRANSFORMED], fetch="fetchnumpy")
+    print("Computed CO2 rollup")
+    logger.info("Computed CO2 rollup")
+    return rollup
+
+def rollup_series(rollup, taxi_type, grain, *values):
+    """(periods, *value arrays) of one taxi type and grain of rollup columns, ordered by period"""
+    rows = (rollup["taxi_type"] == taxi_type) & (rollup["grain"] == grain)
+    periods = np.ma.getdata(rollup["period"])[rows]
+    order = np.argsort(periods)
+    return (periods[order],) + tuple(np.asarray(rollup[value])[rows][order] for value in values)
 
+def rollup_taxi_types(rollup):
+    """The configured fleets (fleets.TAXI_TYPES) that have transformed trips in the rollup"""
+    return [t for t in fleets.TAXI_TYPES if (rollup["taxi_type"] == t).any()]
+
+def heavy_and_light(rollup, taxi_type, grain):
+    """(period, avg_kg) of the most carbon heavy and carbon light period of a grain"""
+    periods, avg_kg = rollup_series(rollup, taxi_type, grain, "avg_kg")
+    heavy, light = avg_kg.argmax(), avg_kg.argmin()
+    return (periods[heavy], avg_kg[heavy]), (periods[light], avg_kg[light])
+
+def report_charts(rollup, report=REPORT):
+    """
+    Charts to render for the report spec: lines take their series from the rollup
+    columns; od_heatmap charts are left out when the OD matrix hasn't been built.
+    """
+    years = f"{fleets.YEARS[0]}–{fleets.YEARS[-1]}" if len(fleets.YEARS) > 1 else str(fleets.YEARS[0])
+    jobs = []
+    for spec in report:
+        if spec["kind"] == "lines":
+            series = {}
+            for t in fleets.TAXI_TYPES:
+                periods, values = rollup_series(rollup, t, spec["grain"], spec["value"])
+                if len(periods):
+                    series[t.capitalize()] = (periods, values)
+            jobs.append({**spec, "title": f"{spec['title']} ({years})", "series": series,
+                         "path": os.path.join(REPORT_DIR, f"{spec['name']}.png")})
+        elif spec["kind"] == "od_heatmap":
+            if not os.path.exists(od_matrix.OD_PATH):
+                print(f"No OD matrix at {od_matrix.OD_PATH}, skipping {spec['name']} (run od_matrix.py)")
+                logger.info(f"No OD matrix at {od_matrix.OD_PATH}, skipping {spec['name']}")
+                continue
+            for t in od_matrix.TAXI_TYPES:
+                jobs.append({**spec, "title": f"{spec['title']} — {t.capitalize()} ({years})", "taxi_type": t,
+                             "od_path": od_matrix.OD_PATH, "path": os.path.join(REPORT_DIR, f"{spec['name']}_{t}.png")})
+    return jobs
+
+def sample_percent(con):
+    """Percent of the transformed trips a block sample needs to hold about APPROX_SAMPLE_ROWS"""
+    rows = con.execute(f"SELECT COUNT(*) FROM {TRANSFORMED};").fetchone()[0]
+    return min(100.0, 100.0 * APPROX_SAMPLE_ROWS / max(rows, 1))
+
+def t_quantile(confidence, df):
+    """
+    Two-sided Student t critical value for a confidence level, per element of the df
+    array: exact for 1 and 2 degrees of freedom, the Cornish-Fisher expansion around the
+    normal quantile from 3 on (within 0.005 of the exact value)
+    """
+    p = (1 + confidence) / 2
+    z = NormalDist().inv_cdf(p)
+    df = np.asarray(df, dtype=np.float64)
+    g1 = (z**3 + z) / 4
+    g2 = (5 * z**5 + 16 * z**3 + 3 * z) / 96
+    g3 = (3 * z**7 + 19 * z**5 + 17 * z**3 - 15 * z) / 384
+    g4 = (79 * z**9 + 776 * z**7 + 1482 * z**5 - 1920 * z**3 - 945 * z) / 92160
+    with np.errstate(divide="ignore", invalid="ignore"):
+        expansion = z + g1 / df + g2 / df**2 + g3 / df**3 + g4 / df**4
+    return np.select(
+        [df == 1, df == 2, df >= 3],
+        [np.tan(np.pi * (p - 0.5)), (2 * p - 1) / np.sqrt(2 * p * (1 - p)), expansion],
+        np.nan,
+    )
+
+def approx_co2_rollup(con, percent):
+    """
+    Estimate avg trip_co2_kgs for every taxi type x grain from a block sample of the
+    transformed trips, as NumPy columns taxi_type, grain, period, avg_kg and half_width.
+    The sample is a cluster sample (whole vectors of nearby trips), so the interval
+    half width comes from the ratio estimator's variance across the m sampled vectors
+    and the t quantile with m - 1 degrees of freedom (NaN when a period was seen in fewer
+    than two of them). A 100% sample reads every trip, so its averages are exact and
+    their half widths 0.
+    """
+    grain_case = " ".join(
+        f"WHEN GROUPING({column}) = 0 THEN '{grain}'" for grain, column in GRAINS.items()
+    )
+    grouping_sets = ", ".join(
+        ["(taxi_type, block)"] + [f"(taxi_type, {column}, block)" for column in GRAINS.values()]
+    )
+
+    cols = con.execute(f"""
+        WITH blocks AS (
+            SELECT
+                CAST(taxi_type AS VARCHAR) AS taxi_type,
+                CASE {grain_case} ELSE 'year' END AS grain,
+                CAST(COALESCE({', '.join(GRAINS.values())}) AS INTEGER) AS period,
+                SUM(trip_co2_kgs) AS s,
+                COUNT(trip_co2_kgs) AS c
+            FROM (
+                SELECT *, rowid // {VECTOR_SIZE} AS block
+                FROM {TRANSFORMED} TABLESAMPLE system({percent}%)
+            )
+            GROUP BY GROUPING SETS ({grouping_sets})
+        )
+        SELECT
+            taxi_type, grain, period,
+            SUM(s) / SUM(c) AS avg_kg,
+            COUNT(*) AS m,
+            -- sum over vectors of (s - avg_kg * c)^2, expanded so it needs one pass
+            SUM(s * s) - 2 * SUM(s) / SUM(c) * SUM(s * c) + power(SUM(s) / SUM(c), 2) * SUM(c * c) AS ss,
+            SUM(c) / COUNT(*) AS mean_c
+        FROM blocks
+        GROUP BY taxi_type, grain, period;
+    """).fetchnumpy()
+
+    fpc = 1 - percent / 100
+    m = np.asarray(cols["m"], dtype=np.float64)
+    if fpc <= 0:
+        half_width = np.zeros_like(m)
+    else:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            variance = fpc * np.maximum(cols["ss"], 0) / (m * (m - 1)) / np.asarray(cols["mean_c"]) ** 2
+        half_width = np.where(m > 1, t_quantile(APPROX_CONFIDENCE, m - 1) * np.sqrt(variance), np.nan)
+    return {
+        "taxi_type": cols["taxi_type"], "grain": cols["grain"], "period": cols["period"],
+        "avg_kg": cols["avg_kg"], "half_width": half_width,
+    }
+
+def approx_year_summary(con, percent):
+    """
+    Per taxi type from a block sample: trips (scaled up), sample max, median and 99th
+    percentile trip_co2_kgs (approx_quantile) and pickup zones (approx_count_distinct,
+    whose estimate can overshoot, capped at the TLC_ZONES there are)
+    """
+    cols = con.execute(f"""
+        SELECT
+            CAST(taxi_type AS VARCHAR),
+            COUNT(*) * 100 / {percent},
+            MAX(trip_co2_kgs),
+            approx_quantile(trip_co2_kgs, 0.5),
+            approx_quantile(trip_co2_kgs, 0.99),
+            LEAST(approx_count_distinct(pu_location_id), {TLC_ZONES})
+        FROM {TRANSFORMED} TABLESAMPLE system({percent}%)
+        GROUP BY taxi_type;
+    """).fetchnumpy()
+    return {t: rest for t, *rest in zip(*cols.values())}
+
+def approx_heavy_and_light(estimates, taxi_type, grain):
+    """
+    ((period, avg_kg, half_width), ambiguous) for the heaviest and the lightest period of
+    a grain. A pick is ambiguous when its interval overlaps the runner-up's, or either
+    has no interval. Exact averages (half width 0 on both) never are.
+    """
+    period, avg_kg, half_width = rollup_series(estimates, taxi_type, grain, "avg_kg", "half_width")
+    periods = [
+        (period[i], avg_kg[i], None if np.isnan(half_width[i]) else half_width[i])
+        for i in np.argsort(avg_kg)
+    ]
+
+    def overlaps(a, b):
+        if a[2] is None or b[2] is None:
+            return True
+        if a[2] == 0 and b[2] == 0:
+            return False
+        return a[1] - a[2] <= b[1] + b[2] and b[1] - b[2] <= a[1] + a[2]
+
+    heavy, light = periods[-1], periods[0]
+    heavy_ambiguous = len(periods) > 1 and overlaps(periods[-1], periods[-2])
+    light_ambiguous = len(periods) > 1 and overlaps(periods[0], periods[1])
+    return (heavy, heavy_ambiguous), (light, light_ambiguous)
+
+def approx_answer(label, estimate, name=str):
+    """'LABEL: period (avg ± half width)', flagged when the pick is ambiguous"""
+    (period, avg_kg, half_width), ambiguous = estimate
+    interval = f"± {half_width:.4f}" if half_width is not None else "± ?"
+    flag = " [AMBIGUOUS]" if ambiguous else ""
+    return f"{label}: {name(period)} ({avg_kg:.4f} {interval}){flag}"
+
+def analyze_approx(con=None):
+    """
+    Quick look (--approx): questions 1-5 estimated from a block sample of about
+    APPROX_SAMPLE_ROWS trips, each average with an APPROX_CONFIDENCE interval, and heavy/light
+    picks whose interval overlaps the runner-up's flagged [AMBIGUOUS].
+    Question 1 reports the sample max, a lower bound on the true max, with the median and
+    99th percentile. No charts are rendered.
+    Returns True if it succeeded.
+    """
+    try:
+        if con is None:
+            # Connect to local DuckDB instance
+            con = instrument.connect("analysis", database='emissions.duckdb', read_only=True)
+            logger.info("Connected to DuckDB instance")
+
+        percent = sample_percent(con)
+        estimates = approx_co2_rollup(con, percent)
+        summary = approx_year_summary(con, percent)
+        print(f"Approximate answers from a {percent:.2f}% block sample "
+              f"(avg CO2 kg per trip ± {APPROX_CONFIDENCE:.0%} CI)")
+        logger.info(f"Approximate answers from a {percent:.2f}% block sample")
+
+        lines = []
+        lines.append("1) Largest CO2 trip (kg, sample max = lower bound) — " + "; ".join(
+            f"{t.upper()}: ≥ {mx:.4f} (median {p50:.4f}, p99 {p99:.4f}, ~{trips:,.0f} trips, ~{zones} pickup zones)"
+            for t, (trips, mx, p50, p99, zones) in ((t, summary[t]) for t in rollup_taxi_types(estimates))
+        ))
+
+        questions = [
+            ("2) Hour", "hour", str),
+            ("3) Day of week", "dow", lambda p: DOW[int(p)]),
+            ("4) Week of year", "week", str),
+            ("5) Month", "month", str),
+        ]
+        for title, grain, name in questions:
+            answers = []
+            for t in rollup_taxi_types(estimates):
+                heavy, light = approx_heavy_and_light(estimates, t, grain)
+                answers.append(approx_answer(f"{t.upper()} HEAVY", heavy, name) + ", "
+                               + approx_answer(f"{t.upper()} LIGHT", light, name))
+            lines.append(f"{title} — " + "; ".join(answers))
+
+        for line in lines:
+            print(line)
+            logger.info(line)
+        return True
+
+    except Exception as e:
+        print(f"An error occurred: {e}")
+        logger.error(f"An error occurred: {e}")
+        return False
+
+def analyze_parquet_files(con=None):
+    """
+    Prints 6 analysis results for each fleet with transformed trips (YELLOW, GREEN, ...)
+    and saves the REPORT charts as PNGs in REPORT_DIR (output/co2_by_month.png, hour and
+    day of week profiles, OD heatmaps).
+    All answers and the line charts are read from the CO2 rollup, computed with one scan
+    (or taken from the query cache when the transformed trips are unchanged).
+    Returns True if it succeeded.
+    """
     try:
-        # Connect to local DuckDB instance
-        con = duckdb.connect(database='emissions.duckdb', read_only=False)
-        logger.info("Connected to DuckDB instance")
+        if con is None:
+            # Connect to local DuckDB instance
+            con = instrument.connect("analysis", database='emissions.duckdb', read_only=False)
+            logger.info("Connected to DuckDB instance")
 
-        yellow = "yellow_trips_2024_transformed"
-        green  = "green_trips_2024_transformed"
+        rollup = co2_rollup(con)
+        taxi_types = rollup_taxi_types(rollup)
 
         # What was the single largest carbon producing trip of the year for YELLOW and GREEN trips? (One result for each type)
-        y_max = con.execute(f"SELECT MAX(trip_co2_kgs) FROM {yellow};").fetchone()[0]
-        g_max = con.execute(f"SELECT MAX(trip_co2_kgs) FROM {green};").fetchone()[0]
-        print(f"1) Largest CO2 trip (kg) - YELLOW: {y_max}, GREEN: {g_max}")
-        logger.info(f"1) Largest CO2 trip (kg) - YELLOW: {y_max}, GREEN: {g_max}")
+        largest = ", ".join(
+            f"{t.upper()}: {rollup_series(rollup, t, 'year', 'max_kg')[1][0]}" for t in taxi_types
+        )
+        print(f"1) Largest CO2 trip (kg) - {largest}")
+        logger.info(f"1) Largest CO2 trip (kg) - {largest}")
 
         # Across the entire year, what on average are the most carbon heavy and carbon light hours of the day for YELLOW and for GREEN trips? (1-24)
-        y_hour_heavy = con.execute(f"""
-            SELECT hour_of_day, AVG(trip_co2_kgs) AS avg_kg
-            FROM {yellow} GROUP BY hour_of_day
-            ORDER BY avg_kg DESC LIMIT 1;
-        """).fetchone()
-        y_hour_light = con.execute(f"""
-            SELECT hour_of_day, AVG(trip_co2_kgs) AS avg_kg
-            FROM {yellow} GROUP BY hour_of_day
-            ORDER BY avg_kg ASC LIMIT 1;
-        """).fetchone()
-
-        g_hour_heavy = con.execute(f"""
-            SELECT hour_of_day, AVG(trip_co2_kgs) AS avg_kg
-            FROM {green} GROUP BY hour_of_day
-            ORDER BY avg_kg DESC LIMIT 1;
-        """).fetchone()
-        g_hour_light = con.execute(f"""
-            SELECT hour_of_day, AVG(trip_co2_kgs) AS avg_kg
-            FROM {green} GROUP BY hour_of_day
-            ORDER BY avg_kg ASC LIMIT 1;
-        """).fetchone()
-
-        print(f"2) Hour (avg CO2 kg per trip) — "
-              f"YELLOW HEAVY: {y_hour_heavy[0]} ({y_hour_heavy[1]:.4f}), "
-              f"YELLOW LIGHT: {y_hour_light[0]} ({y_hour_light[1]:.4f}); "
-              f"GREEN HEAVY: {g_hour_heavy[0]} ({g_hour_heavy[1]:.4f}), "
-              f"GREEN LIGHT: {g_hour_light[0]} ({g_hour_light[1]:.4f})")
-        logger.info(f"2) Hour (avg CO2 kg per trip) — "
-              f"YELLOW HEAVY: {y_hour_heavy[0]} ({y_hour_heavy[1]:.4f}), "
-              f"YELLOW LIGHT: {y_hour_light[0]} ({y_hour_light[1]:.4f}); "
-              f"GREEN HEAVY: {g_hour_heavy[0]} ({g_hour_heavy[1]:.4f}), "
-              f"GREEN LIGHT: {g_hour_light[0]} ({g_hour_light[1]:.4f})")
-
-        # Across the entire year, what on average are the most carbon heavy and carbon light days of the week for YELLOW and for GREEN trips? (Sun-Sat)
-        y_dow_heavy = con.execute(f"""
-            SELECT day_of_week, AVG(trip_co2_kgs) AS avg_kg
-            FROM {yellow} GROUP BY day_of_week
-            ORDER BY avg_kg DESC LIMIT 1;
-        """).fetchone()
-        y_dow_light = con.execute(f"""
-            SELECT day_of_week, AVG(trip_co2_kgs) AS avg_kg
-            FROM {yellow} GROUP BY day_of_week
-            ORDER BY avg_kg ASC LIMIT 1;
-        """).fetchone()
-
-        g_dow_heavy = con.execute(f"""
-            SELECT day_of_week, AVG(trip_co2_kgs) AS avg_kg
-            FROM {green} GROUP BY day_of_week
-            ORDER BY avg_kg DESC LIMIT 1;
-        """).fetchone()
-        g_dow_light = con.execute(f"""
-            SELECT day_of_week, AVG(trip_co2_kgs) AS avg_kg
-            FROM {green} GROUP BY day_of_week
-            ORDER BY avg_kg ASC LIMIT 1;
-        """).fetchone()
-
-        dow = ["Sun","Mon","Tue","Wed","Thu","Fri","Sat"]
-        print(f"3) Day of week (avg CO2 kg per trip) — "
-              f"YELLOW HEAVY: {dow[int(y_dow_heavy[0])]} ({y_dow_heavy[1]:.4f}), "
-              f"YELLOW LIGHT: {dow[int(y_dow_light[0])]} ({y_dow_light[1]:.4f}); "
-              f"GREEN HEAVY: {dow[int(g_dow_heavy[0])]} ({g_dow_heavy[1]:.4f}), "
-              f"GREEN LIGHT: {dow[int(g_dow_light[0])]} ({g_dow_light[1]:.4f})")
-        logger.info(f"3) Day of week (avg CO2 kg per trip) — "
-              f"YELLOW HEAVY: {dow[int(y_dow_heavy[0])]} ({y_dow_heavy[1]:.4f}), "
-              f"YELLOW LIGHT: {dow[int(y_dow_light[0])]} ({y_dow_light[1]:.4f}); "
-              f"GREEN HEAVY: {dow[int(g_dow_heavy[0])]} ({g_dow_heavy[1]:.4f}), "
-              f"GREEN LIGHT: {dow[int(g_dow_light[0])]} ({g_dow_light[1]:.4f})")
-
-        # Across the entire year, what on average are the most carbon heavy and carbon light weeks of the year for YELLOW and for GREEN trips? (1-52)
-        y_week_heavy = con.execute(f"""
-            SELECT week_of_year, AVG(trip_co2_kgs) AS avg_kg
-            FROM {yellow} GROUP BY week_of_year
-            ORDER BY avg_kg DESC LIMIT 1;
-        """).fetchone()
-        y_week_light = con.execute(f"""
-            SELECT week_of_year, AVG(trip_co2_kgs) AS avg_kg
-            FROM {yellow} GROUP BY week_of_year
-            ORDER BY avg_kg ASC LIMIT 1;
-        """).fetchone()
-
-        g_week_heavy = con.execute(f"""
-            SELECT week_of_year, AVG(trip_co2_kgs) AS avg_kg
-            FROM {green} GROUP BY week_of_year
-            ORDER BY avg_kg DESC LIMIT 1;
-        """).fetchone()
-        g_week_light = con.execute(f"""
-            SELECT week_of_year, AVG(trip_co2_kgs) AS avg_kg
-            FROM {green} GROUP BY week_of_year
-            ORDER BY avg_kg ASC LIMIT 1;
-        """).fetchone()
-
-        print(f"4) Week of year (avg CO2 kg per trip) — "
-              f"YELLOW HEAVY: {int(y_week_heavy[0])} ({y_week_heavy[1]:.4f}), "
-              f"YELLOW LIGHT: {int(y_week_light[0])} ({y_week_light[1]:.4f}); "
-              f"GREEN HEAVY: {int(g_week_heavy[0])} ({g_week_heavy[1]:.4f}), "
-              f"GREEN LIGHT: {int(g_week_light[0])} ({g_week_light[1]:.4f})")
-        logger.info(f"4) Week of year (avg CO2 kg per trip) — "
-              f"YELLOW HEAVY: {int(y_week_heavy[0])} ({y_week_heavy[1]:.4f}), "
-              f"YELLOW LIGHT: {int(y_week_light[0])} ({y_week_light[1]:.4f}); "
-              f"GREEN HEAVY: {int(g_week_heavy[0])} ({g_week_heavy[1]:.4f}), "
-              f"GREEN LIGHT: {int(g_week_light[0])} ({g_week_light[1]:.4f})")
-        
-        # Across the entire year, what on average are the most carbon heavy and carbon light months of the year for YELLOW and for GREEN trips? (Jan-Dec)
-        y_month_heavy = con.execute(f"""
-            SELECT month_of_year, AVG(trip_co2_kgs) AS avg_kg
-            FROM {yellow} GROUP BY month_of_year
-            ORDER BY avg_kg DESC LIMIT 1;
-        """).fetchone()
-        y_month_light = con.execute(f"""
-            SELECT month_of_year, AVG(trip_co2_kgs) AS avg_kg
-            FROM {yellow} GROUP BY month_of_year
-            ORDER BY avg_kg ASC LIMIT 1;
-        """).fetchone()
-
-        g_month_heavy = con.execute(f"""
-            SELECT month_of_year, AVG(trip_co2_kgs) AS avg_kg
-            FROM {green} GROUP BY month_of_year
-            ORDER BY avg_kg DESC LIMIT 1;
-        """).fetchone()
-        g_month_light = con.execute(f"""
-            SELECT month_of_year, AVG(trip_co2_kgs) AS avg_kg
-            FROM {green} GROUP BY month_of_year
-            ORDER BY avg_kg ASC LIMIT 1;
-        """).fetchone()
-
-        print(f"5) Month (avg CO2 kg per trip) — "
-              f"YELLOW HEAVY: {int(y_month_heavy[0])} ({y_month_heavy[1]:.4f}), "
-              f"YELLOW LIGHT: {int(y_month_light[0])} ({y_month_light[1]:.4f}); "
-              f"GREEN HEAVY: {int(g_month_heavy[0])} ({g_month_heavy[1]:.4f}), "
-              f"GREEN LIGHT: {int(g_month_light[0])} ({g_month_light[1]:.4f})")
-        logger.info("Month results computed")
+        # ... days of the week (Sun-Sat), weeks of the year (1-52) and months of the year (Jan-Dec)
+        questions = [
+            ("2) Hour", "hour", str),
+            ("3) Day of week", "dow", lambda p: DOW[int(p)]),
+            ("4) Week of year", "week", lambda p: str(int(p))),
+            ("5) Month", "month", lambda p: str(int(p))),
+        ]
+        for title, grain, name in questions:
+            answers = []
+            for t in taxi_types:
+                heavy, light = heavy_and_light(rollup, t, grain)
+                answers.append(f"{t.upper()} HEAVY: {name(heavy[0])} ({heavy[1]:.4f}), "
+                               f"{t.upper()} LIGHT: {name(light[0])} ({light[1]:.4f})")
+            line = f"{title} (avg CO2 kg per trip) — " + "; ".join(answers)
+            print(line)
+            logger.info(line)
 
         # Generate a time-series plot or histogram with MONTH along the X-axis and CO2 totals along the Y-axis. Render two lines/bars/plots of data, one each for YELLOW and GREEN taxi trip CO2 totals
-        y_month_totals = con.execute(f"""
-            SELECT month_of_year AS m, SUM(trip_co2_kgs) AS total_kg
-            FROM {yellow} GROUP BY m ORDER BY m;
-        """).fetchall()
-        g_month_totals = con.execute(f"""
-            SELECT month_of_year AS m, SUM(trip_co2_kgs) AS total_kg
-            FROM {green} GROUP BY m ORDER BY m;
-        """).fetchall()
-
-        y_m = [int(r[0]) for r in y_month_totals]; y_tot = [float(r[1]) for r in y_month_totals]
-        g_m = [int(r[0]) for r in g_month_totals]; g_tot = [float(r[1]) for r in g_month_totals]
-
-        plt.figure(figsize=(9,5))
-        plt.plot(y_m, y_tot, label="Yellow CO2 total (kg)")
-        plt.plot(g_m, g_tot, label="Green CO2 total (kg)")
-        plt.title("Total CO2 by Month (2024)")
-        plt.xlabel("Month (1–12)")
-        plt.ylabel("Total CO2 (kg)")
-        plt.legend()
-        plt.tight_layout()
-        out = "output/co2_by_month.png"
-        plt.savefig(out)
-        plt.close()
-
-        print(f"6) Plot saved to {out}")
-        logger.info(f"Plot saved to {out}")
+        # (co2_by_month in REPORT, rendered with the other charts in worker processes)
+        paths = charts.render_charts(report_charts(rollup))
+
+        print(f"6) Plots saved to {', '.join(paths)}")
+        logger.info(f"Plots saved to {', '.join(paths)}")
+        return True
 
     except Exception as e:
         print(f"An error occurred: {e}")
         logger.error(f"An error occurred: {e}")
+        return False
 
 if __name__ == "__main__":
-    analyze_parquet_files()
+    logging.basicConfig(
+        level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s',
+        filename='logs/analysis.log'
+    )
+    parser = argparse.ArgumentParser(description="Answer the CO2 questions and render the report charts")
+    parser.add_argument("--approx", action="store_true",
+                        help="quick look: estimates with confidence intervals from a block sample, no charts")
+    args = parser.parse_args()
+
+    if args.approx:
+        analyze_approx()
+    else:
+        analyze_parquet_files()
     print("Data analysis complete.")
-    logger.info("Data analysis complete.")
\ No newline at end of file
+    logger.info("Data analysis complete.")
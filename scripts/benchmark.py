@@ -0,0 +1,197 @@
+import argparse
+import datetime
+import json
+import logging
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import time
+
+import duckdb
+
+from generate_data import generate
+from resources import parse_size
+
+logging.basicConfig(
+    level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s',
+    filename='logs/benchmark.log'
+)
+logger = logging.getLogger(__name__)
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPTS_DIR = os.path.join(REPO_DIR, "scripts")
+DBT_DIR = os.path.join(REPO_DIR, "dbt")
+
+# Share of a --memory-cap given to DuckDB's memory_limit when DUCKDB_MEMORY_LIMIT is not
+# set; the rest is headroom for Python, dbt and memory DuckDB does not track
+MEMORY_LIMIT_SHARE = 0.6
+
+# Pipeline stages in run order, each run as its own process so its peak RSS can be measured
+STAGES = {
+    "load": [sys.executable, os.path.join(SCRIPTS_DIR, "load.py")],
+    "clean": [sys.executable, os.path.join(SCRIPTS_DIR, "clean.py")],
+    "transform": [sys.executable, os.path.join(SCRIPTS_DIR, "transform.py")],
+    "analysis": [sys.executable, os.path.join(SCRIPTS_DIR, "analysis.py")],
+}
+
+# A stage only counts as regressed if it is also this many seconds slower, so
+# process start-up jitter on small scales is not reported
+MIN_SLOWDOWN_SECONDS = 0.5
+
+def prepare_workdir(workdir):
+    """
+    Fresh working directory laid out like the repository root (logs/, output/,
+    data/vehicle_emissions.csv), so the stage scripts run unchanged against their own
+    emissions.duckdb.
+    """
+    shutil.rmtree(workdir, ignore_errors=True)
+    for sub in ("logs", "output", "data"):
+        os.makedirs(os.path.join(workdir, sub))
+    shutil.copy(os.path.join(REPO_DIR, "data", "vehicle_emissions.csv"), os.path.join(workdir, "data"))
+
+def run_stage(stage, workdir, env):
+    """
+    Run one stage in workdir and return (seconds, peak RSS in MB).
+    Raises RuntimeError if the stage fails; the stage scripts log errors instead of
+    exiting non-zero, so their output is checked too.
+    """
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        STAGES[stage], cwd=workdir, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True
+    )
+    output = process.stdout.read()
+    _, status, rusage = os.wait4(process.pid, 0)
+    seconds = time.perf_counter() - start
+    process.returncode = os.waitstatus_to_exitcode(status)
+
+    if process.returncode != 0 or "An error occurred" in output:
+        raise RuntimeError(f"{stage} failed:\n{output[-2000:]}")
+    # ru_maxrss is in KB on Linux
+    return seconds, rusage.ru_maxrss / 1024
+
+def run_scale(scale, workdir, memory_cap=None):
+    """
+    Generate (once) and run the whole pipeline at one scale, returning one result per stage.
+    With memory_cap (bytes), each stage gets a resource profile within it and its result
+    says whether its peak RSS stayed under the cap.
+    """
+    data_dir = os.path.join(workdir, f"data-{scale}")
+    run_dir = os.path.join(workdir, f"run-{scale}")
+    rows = generate(data_dir, scale)
+    print(f"Scale {scale:,}: {rows:,} generated rows in {data_dir}")
+    logger.info(f"Scale {scale:,}: {rows:,} generated rows in {data_dir}")
+
+    prepare_workdir(run_dir)
+    env = dict(os.environ, TLC_SOURCE_DIR=os.path.abspath(data_dir), DBT_PROJECT_DIR=DBT_DIR)
+    if memory_cap:
+        env.setdefault("DUCKDB_MEMORY_LIMIT", f"{int(memory_cap * MEMORY_LIMIT_SHARE) // 2**20}MiB")
+        env.setdefault("DUCKDB_PRESERVE_INSERTION_ORDER", "false")
+
+    results = []
+    for stage in STAGES:
+        seconds, peak_rss_mb = run_stage(stage, run_dir, env)
+        result = {
+            "scale": scale,
+            "stage": stage,
+            "rows": rows,
+            "seconds": round(seconds, 3),
+            "rows_per_sec": round(rows / seconds),
+            "peak_rss_mb": round(peak_rss_mb, 1),
+        }
+        if memory_cap:
+            result["within_cap"] = peak_rss_mb * 2**20 <= memory_cap
+        results.append(result)
+        print(f"  {stage:<10} {seconds:8.2f}s  {result['rows_per_sec']:>12,} rows/s  {peak_rss_mb:8.1f} MB")
+        logger.info(f"Result: {result}")
+    return results
+
+def compare(results, baseline, tolerance):
+    """
+    Compare stage timings with a baseline run. Returns the list of regressions: stages
+    at a scale present in both runs that got slower than baseline * (1 + tolerance)
+    and by more than MIN_SLOWDOWN_SECONDS.
+    """
+    previous = {(r["scale"], r["stage"]): r for r in baseline["results"]}
+    regressions = []
+    for r in results:
+        base = previous.get((r["scale"], r["stage"]))
+        if base is None:
+            continue
+        ratio = r["seconds"] / base["seconds"] if base["seconds"] else 1.0
+        print(f"  {r['stage']:<10} @ {r['scale']:>12,}: {base['seconds']:8.2f}s -> {r['seconds']:8.2f}s ({ratio:.2f}x)")
+        if ratio > 1 + tolerance and r["seconds"] - base["seconds"] > MIN_SLOWDOWN_SECONDS:
+            regressions.append({**r, "baseline_seconds": base["seconds"], "ratio": round(ratio, 2)})
+    return regressions
+
+def run_benchmark(scales, workdir, output, baseline_path, tolerance, save_baseline, memory_cap=None):
+    """
+    Time load, clean, dbt transform and analysis at each scale, write the results to
+    output as JSON and compare them with the stored baseline. Returns False if any
+    stage regressed beyond tolerance or went over memory_cap.
+    """
+    results = []
+    for scale in scales:
+        results.extend(run_scale(scale, workdir, memory_cap))
+
+    report = {
+        "created_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "duckdb": duckdb.__version__,
+        "cpu_count": os.cpu_count(),
+        "memory_cap_mb": memory_cap // 2**20 if memory_cap else None,
+        "results": results,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+    logger.info(f"Results written to {output}")
+
+    ok = True
+    for r in results:
+        if r.get("within_cap") is False:
+            print(f"OVER MEMORY CAP: {r['stage']} at {r['scale']:,} rows peaked at {r['peak_rss_mb']:,} MB")
+            logger.warning(f"Over memory cap: {r}")
+            ok = False
+
+    if os.path.exists(baseline_path):
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+        print(f"Comparing with baseline {baseline_path} ({baseline['created_at']}):")
+        regressions = compare(results, baseline, tolerance)
+        for r in regressions:
+            print(f"REGRESSION: {r['stage']} at {r['scale']:,} rows is {r['ratio']}x the baseline")
+            logger.warning(f"Regression: {r}")
+        ok = ok and not regressions
+
+    if save_baseline:
+        shutil.copy(output, baseline_path)
+        print(f"Saved as baseline {baseline_path}")
+        logger.info(f"Saved as baseline {baseline_path}")
+    return ok
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline on synthetic data")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1_000_000],
+                        help="approximate trips per year to generate, e.g. 1000000 10000000 200000000")
+    parser.add_argument("--workdir", default="bench/work", help="generated data and per-scale run directories")
+    parser.add_argument("--output", default=None, help="results JSON (default bench/results-<timestamp>.json)")
+    parser.add_argument("--baseline", default="bench/baseline.json", help="baseline results to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown vs baseline (0.2 = 20%%)")
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the new baseline")
+    parser.add_argument("--memory-cap", default=None,
+                        help="RAM every stage must stay under, e.g. 4GB; sets DUCKDB_MEMORY_LIMIT unless given")
+    args = parser.parse_args()
+
+    output = args.output or f"bench/results-{datetime.datetime.now():%Y%m%d-%H%M%S}.json"
+    try:
+        memory_cap = parse_size(args.memory_cap) if args.memory_cap else None
+        ok = run_benchmark(args.scales, args.workdir, output, args.baseline, args.tolerance,
+                           args.save_baseline, memory_cap)
+    except Exception as e:
+        print(f"An error occurred: {e}")
+        logger.error(f"An error occurred: {e}")
+        ok = False
+    sys.exit(0 if ok else 1)
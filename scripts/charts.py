@@ -0,0 +1,77 @@
+"""
+Chart rendering for the analysis report. Every chart is drawn in a worker process with
+matplotlib's headless Agg backend: matplotlib is only imported in the workers, so the
+text report never loads it and charts render side by side.
+
+A chart is a dict with its kind, output path and labels:
+- lines: "series" {label: (x array, y array)}, optional "xticklabels" for x = 0, 1, ...
+- od_heatmap: "od_path" and "taxi_type"; the worker sums the fleet's CO2 zone matrix
+  from the memory-mapped OD matrix file itself, so the array is never pickled
+"""
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import od_matrix
+
+logger = logging.getLogger(__name__)
+
+# Worker processes rendering charts (override with REPORT_PROCESSES; default one per core)
+PROCESSES = int(os.environ.get("REPORT_PROCESSES", str(os.cpu_count() or 1)))
+
+def draw_lines(plt, chart):
+    """One line per series"""
+    fig, ax = plt.subplots(figsize=(9, 5))
+    for label, (x, y) in chart["series"].items():
+        ax.plot(x, y, label=label)
+    if chart.get("xticklabels"):
+        ax.set_xticks(range(len(chart["xticklabels"])), chart["xticklabels"])
+    ax.set_title(chart["title"])
+    ax.set_xlabel(chart["xlabel"])
+    ax.set_ylabel(chart["ylabel"])
+    ax.legend()
+    return fig
+
+def draw_od_heatmap(plt, chart):
+    """Pickup zone x dropoff zone CO2, on a log scale so the busiest pairs don't hide the rest"""
+    matrix = od_matrix.ODMatrix(chart["od_path"]).matrix("co2_kg", [chart["taxi_type"]])
+    fig, ax = plt.subplots(figsize=(8, 7))
+    image = ax.imshow(np.log10(1 + matrix[1:, 1:]), origin="lower", extent=(0.5, 265.5, 0.5, 265.5),
+                      cmap="viridis", interpolation="nearest")
+    fig.colorbar(image, ax=ax, label="log10(1 + CO2 kg)")
+    ax.set_title(chart["title"])
+    ax.set_xlabel("Dropoff zone (DOLocationID)")
+    ax.set_ylabel("Pickup zone (PULocationID)")
+    return fig
+
+DRAW = {
+    "lines": draw_lines,
+    "od_heatmap": draw_od_heatmap,
+}
+
+def render_chart(chart):
+    """Worker: draw one chart and save it as a PNG; returns its path"""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    fig = DRAW[chart["kind"]](plt, chart)
+    fig.tight_layout()
+    fig.savefig(chart["path"])
+    plt.close(fig)
+    logger.info(f"Rendered {chart['path']}")
+    return chart["path"]
+
+def render_charts(charts, processes=PROCESSES):
+    """Render charts with a pool of worker processes; returns their paths in order"""
+    if not charts:
+        return []
+    processes = max(1, min(processes, len(charts)))
+    for chart in charts:
+        os.makedirs(os.path.dirname(chart["path"]) or ".", exist_ok=True)
+    # spawned, not forked: the caller holds DuckDB threads
+    with ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return list(pool.map(render_chart, charts))
@@ -1,153 +1,369 @@
-import duckdb
+import argparse
 import logging
+import os
+
+import fleets
+import instrument
+import resources
 
-logging.basicConfig(
-    level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s',
-    filename='logs/clean.log'
-)
 logger = logging.getLogger(__name__)
 
-def clean_parquet_files():
+TRIPS_TABLE = "trips"
+TAXI_TYPES = fleets.TAXI_TYPES
+
+# Cleaning rules in the order they are applied. A row is counted against the
+# first rule it fails; NULL values fail the rule (as they did in the WHERE clause),
+# except passenger_count of fleets that don't report it (fleets.py).
+RULES = ["zero_passengers", "zero_distance", "over_100_miles", "over_1_day"]
+
+# Duplicate detection (override with environment variables)
+# - CLEAN_DEDUP_MODE: 'distinct' compares every column (SELECT DISTINCT *),
+#   'key' compares only the natural trip key, so copies of a trip that differ outside
+#   the key (e.g. store_and_fwd_flag) are duplicates too
+# - CLEAN_TRIP_KEY: comma separated key columns of the trips table
+DEDUP_MODE = os.environ.get("CLEAN_DEDUP_MODE", "distinct")
+TRIP_KEY = os.environ.get(
+    "CLEAN_TRIP_KEY",
+    "taxi_type,vendor_id,pickup_datetime,dropoff_datetime,pu_location_id,do_location_id,trip_distance,fare_amount",
+).split(",")
+
+def pending_months(con, taxi_types=TAXI_TYPES):
+    """
+    Months of the given taxi types loaded (or reloaded) since they were last cleaned,
+    according to load_manifest, as {source_month: [taxi types]}
+    """
+    rows = con.execute("""
+        SELECT source_month, list(taxi_type ORDER BY taxi_type)
+        FROM load_manifest
+        WHERE cleaned_at IS NULL AND list_contains(?, taxi_type)
+        GROUP BY source_month
+        ORDER BY source_month;
+    """, [taxi_types]).fetchall()
+    return dict(rows)
+
+def create_cleaning_report(con):
+    """
+    cleaning_report holds one row per taxi type and month with the number of raw rows,
+    the rows rejected by each rule, the duplicates removed and the rows kept.
+    """
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS cleaning_report (
+            taxi_type VARCHAR,
+            source_month VARCHAR,
+            rows_in BIGINT,
+            zero_passengers BIGINT,
+            zero_distance BIGINT,
+            over_100_miles BIGINT,
+            over_1_day BIGINT,
+            duplicates BIGINT,
+            rows_out BIGINT,
+            cleaned_at TIMESTAMP,
+            PRIMARY KEY (taxi_type, source_month)
+        );
+    """)
+
+def reject_rule_sql():
+    """CASE expression naming the first cleaning rule a row fails (NULL if it passes)"""
+    with_passengers = ", ".join(f"'{name}'" for name, fleet in fleets.FLEETS.items() if fleet["passengers"])
+    return f"""
+        CASE
+            WHEN CAST(taxi_type AS VARCHAR) IN ({with_passengers})
+                AND (passenger_count IS NULL OR passenger_count <= 0) THEN 'zero_passengers'
+            WHEN trip_distance IS NULL OR trip_distance <= 0 THEN 'zero_distance'
+            WHEN trip_distance > 100 THEN 'over_100_miles'
+            WHEN date_diff('second', pickup_datetime, dropoff_datetime) IS NULL
+                OR date_diff('second', pickup_datetime, dropoff_datetime) > 86400 THEN 'over_1_day'
+        END
+    """
+
+def trips_kept_sql():
+    """
+    Query of the 'key' dedup mode's batch: one small row per trip of the given taxi types
+    of one month, with the rowid of the copy kept, its number of copies and the rule it
+    fails. Parameters: source_month, list of taxi types.
+    Trips are grouped on a 64-bit hash of their key columns, not the columns themselves,
+    so the groups stay small (two different trips of a 3M row month share a hash with a
+    chance of about 1 in 4 million).
+    """
+    return f"""
+        SELECT taxi_type, reject_rule, min(rowid) AS kept_rowid, COUNT(*) AS copies
+        FROM (
+            SELECT taxi_type, rowid, {reject_rule_sql()} AS reject_rule, hash({', '.join(TRIP_KEY)}) AS trip
+            FROM {TRIPS_TABLE}
+            WHERE source_month = ? AND list_contains(?, CAST(taxi_type AS VARCHAR))
+        )
+        GROUP BY taxi_type, reject_rule, trip
+    """
+
+def batch_sql(mode):
+    """
+    Query collapsing the given taxi types of one month to one row per trip with a count
+    of its copies and the rule it fails. Parameters: source_month, list of taxi types.
+    - 'distinct': rows are duplicates only if every column matches (SELECT DISTINCT * semantics)
+    - 'key': rows are duplicates if their trip key columns match; the first copy (by
+      rowid) is kept, fetched by rowid from trips_kept_sql
+    """
+    if mode == "distinct":
+        return f"""
+            SELECT *, {reject_rule_sql()} AS reject_rule
+            FROM (
+                SELECT *, COUNT(*) AS copies
+                FROM {TRIPS_TABLE}
+                WHERE source_month = ? AND list_contains(?, CAST(taxi_type AS VARCHAR))
+                GROUP BY ALL
+            )
+        """
+    if mode == "key":
+        return f"""
+            SELECT t.*, k.copies, k.reject_rule
+            FROM {TRIPS_TABLE} AS t
+            JOIN ({trips_kept_sql()}) AS k ON t.rowid = k.kept_rowid
+        """
+    raise ValueError(f"Unknown dedup mode: {mode}")
+
+def report_sql(batch_table):
+    """
+    Query of the cleaning_report rows of a batch built with batch_sql, one per taxi type.
+    Parameters: source_month, list of taxi types.
+    """
+    return f"""
+        SELECT
+            m.taxi_type,
+            ? AS source_month,
+            COALESCE(SUM(copies), 0) AS rows_in,
+            COALESCE(SUM(copies) FILTER (WHERE reject_rule = 'zero_passengers'), 0),
+            COALESCE(SUM(copies) FILTER (WHERE reject_rule = 'zero_distance'), 0),
+            COALESCE(SUM(copies) FILTER (WHERE reject_rule = 'over_100_miles'), 0),
+            COALESCE(SUM(copies) FILTER (WHERE reject_rule = 'over_1_day'), 0),
+            COALESCE(SUM(copies - 1) FILTER (WHERE reject_rule IS NULL), 0) AS duplicates,
+            COUNT(b.copies) FILTER (WHERE reject_rule IS NULL) AS rows_out,
+            now() AS cleaned_at
+        FROM (SELECT unnest(?) AS taxi_type) AS m
+        LEFT JOIN {batch_table} AS b
+            ON CAST(b.taxi_type AS VARCHAR) = m.taxi_type
+        GROUP BY m.taxi_type
+    """
+
+def clean_month(con, month, taxi_types):
+    """
+    Clean one month of the given taxi types in a single scan and its own transaction:
+    - the month is collapsed to one row per trip and tagged with the first rule it fails
+    - the passing rows replace the raw rows of the month in place
+    - per-rule rejection counts are written to cleaning_report from the same batch
+    Duplicates of a rejected row are counted against that rule, not as duplicates.
+    In 'key' mode the batch only holds the rowid kept for each trip, and the duplicate
+    and rejected rows are deleted in place, so the month's rows are never copied.
+    """
+    con.execute("BEGIN TRANSACTION;")
+    try:
+        con.execute(f"""
+            DROP TABLE IF EXISTS {TRIPS_TABLE}_clean_batch;
+            CREATE TEMP TABLE {TRIPS_TABLE}_clean_batch AS
+            {trips_kept_sql() if DEDUP_MODE == "key" else batch_sql(DEDUP_MODE)};
+        """, [month, taxi_types])
+        if DEDUP_MODE == "key":
+            con.execute(f"""
+                DELETE FROM {TRIPS_TABLE}
+                WHERE source_month = ? AND list_contains(?, CAST(taxi_type AS VARCHAR))
+                    AND rowid NOT IN (
+                        SELECT kept_rowid FROM {TRIPS_TABLE}_clean_batch WHERE reject_rule IS NULL
+                    );
+            """, [month, taxi_types])
+        else:
+            con.execute(f"""
+                DELETE FROM {TRIPS_TABLE}
+                WHERE source_month = ? AND list_contains(?, CAST(taxi_type AS VARCHAR));
+            """, [month, taxi_types])
+            con.execute(f"""
+                INSERT INTO {TRIPS_TABLE}
+                SELECT * EXCLUDE (copies, reject_rule)
+                FROM {TRIPS_TABLE}_clean_batch
+                WHERE reject_rule IS NULL;
+            """)
+        con.execute(f"""
+            INSERT OR REPLACE INTO cleaning_report
+            {report_sql(f"{TRIPS_TABLE}_clean_batch")};
+        """, [month, taxi_types])
+        con.execute(f"DROP TABLE {TRIPS_TABLE}_clean_batch;")
+        con.execute("""
+            UPDATE load_manifest SET cleaned_at = now()
+            WHERE source_month = ? AND list_contains(?, taxi_type);
+        """, [month, taxi_types])
+        con.execute("COMMIT;")
+    except Exception:
+        con.execute("ROLLBACK;")
+        raise
+
+def check_dedup_equivalence(con, month, taxi_types):
+    """
+    Compare the rows kept by the 'key' dedup mode with SELECT DISTINCT * semantics on one
+    raw (not yet cleaned) month. Returns (distinct_rows, key_rows).
+    """
+    distinct_rows, key_rows = (
+        con.execute(f"""
+            SELECT COUNT(*) FROM ({batch_sql(mode)})
+            WHERE reject_rule IS NULL;
+        """, [month, taxi_types]).fetchone()[0]
+        for mode in ("distinct", "key")
+    )
+    print(f"{TRIPS_TABLE} {month}: rows kept by DISTINCT *: {distinct_rows:,}, by trip key: {key_rows:,}")
+    logger.info(f"{TRIPS_TABLE} {month}: rows kept by DISTINCT *: {distinct_rows:,}, by trip key: {key_rows:,}")
+    if distinct_rows != key_rows:
+        logger.warning(f"{TRIPS_TABLE} {month}: trip key dedup differs from DISTINCT * by {distinct_rows - key_rows:,} rows")
+    return distinct_rows, key_rows
+
+def clean_trips(con, check_dedup=False, taxi_types=TAXI_TYPES):
+    """
+    Clean only the months of the given taxi types that have not been cleaned yet, one
+    month (all those taxi types together) at a time so peak memory is bounded by a single month.
+    When a month has too many rows for the memory budget, each taxi type is cleaned on its own.
+    With check_dedup, each month is first checked for 'key' vs 'distinct' dedup agreement.
+    """
+    months = pending_months(con, taxi_types)
+    if not months:
+        print(f"{TRIPS_TABLE}: no new {', '.join(taxi_types)} months to clean")
+        logger.info(f"{TRIPS_TABLE}: no new {', '.join(taxi_types)} months to clean")
+        return
+
+    batches = [(month, month_types) for month, month_types in months.items()]
+    # rows of the largest month, the unit clean_month works in
+    rows = con.execute("""
+        SELECT MAX(rows) FROM (
+            SELECT SUM(row_count) AS rows FROM load_manifest
+            WHERE cleaned_at IS NULL AND list_contains(?, taxi_type)
+            GROUP BY source_month
+        );
+    """, [taxi_types]).fetchone()[0]
+    if resources.chunked(con, rows):
+        logger.info(f"{TRIPS_TABLE}: months of up to {rows:,} rows, cleaning one taxi type of a month at a time")
+        batches = [(month, [t]) for month, month_types in batches for t in month_types]
+
+    for month, batch_types in batches:
+        if check_dedup:
+            check_dedup_equivalence(con, month, batch_types)
+        clean_month(con, month, batch_types)
+
+    rows = con.execute("""
+        SELECT taxi_type, SUM(rows_in), SUM(rows_out) FROM cleaning_report
+        WHERE list_contains(?, source_month) AND list_contains(?, taxi_type)
+        GROUP BY taxi_type ORDER BY taxi_type;
+    """, [list(months), taxi_types]).fetchall()
+    print(f"Cleaned {TRIPS_TABLE} months: {', '.join(months)}")
+    logger.info(f"Cleaned {TRIPS_TABLE} months: {', '.join(months)}")
+    for taxi_type, rows_in, rows_out in rows:
+        print(f"Cleaned {taxi_type} rows in those months: {rows_out:,}")
+        print(f"{taxi_type.capitalize()} rows removed during cleaning: {rows_in - rows_out:,}")
+        logger.info(f"{taxi_type.capitalize()} rows removed during cleaning: {rows_in - rows_out:,}")
+
+def cleaning_tests(con, taxi_types=TAXI_TYPES):
     """
-    Clean yellow and green trip data from raw data tables:
+    Verify cleaning from cleaning_report instead of rescanning the trips, per given taxi type:
+    - print how many rows each rule and the duplicate check removed
+    - check every month balances: rows_in = rejected + duplicates + rows_out
+    - check the report's rows_in matches the raw row counts in load_manifest
+    - check the report's rows_out matches the rows left in the table
+    """
+    results = con.execute(f"""
+        WITH report AS (
+            SELECT
+                r.taxi_type,
+                SUM(r.zero_passengers) AS zero_passengers,
+                SUM(r.zero_distance) AS zero_distance,
+                SUM(r.over_100_miles) AS over_100_miles,
+                SUM(r.over_1_day) AS over_1_day,
+                SUM(r.duplicates) AS duplicates,
+                SUM(r.rows_out) AS rows_out,
+                COUNT(*) FILTER (WHERE r.rows_in <> {' + '.join('r.' + rule for rule in RULES)} + r.duplicates + r.rows_out) AS unbalanced,
+                COUNT(*) FILTER (WHERE r.rows_in <> m.row_count) AS mismatched
+            FROM cleaning_report r
+            JOIN load_manifest m USING (taxi_type, source_month)
+            WHERE list_contains(?, r.taxi_type)
+            GROUP BY r.taxi_type
+        ),
+        trips AS (
+            SELECT CAST(taxi_type AS VARCHAR) AS taxi_type, COUNT(*) AS table_rows
+            FROM {TRIPS_TABLE}
+            WHERE list_contains(?, CAST(taxi_type AS VARCHAR))
+            GROUP BY taxi_type
+        )
+        SELECT report.*, COALESCE(trips.table_rows, 0)
+        FROM report LEFT JOIN trips USING (taxi_type)
+        ORDER BY taxi_type;
+    """, [taxi_types, taxi_types]).fetchall()
+
+    for (taxi_type, zero_passengers, zero_trip, long_distance, long_duration,
+         dupes, rows_out, unbalanced, mismatched, table_rows) in results:
+        print(f"\nCleaning Tests for {taxi_type} trips in {TRIPS_TABLE}:")
+        logger.info(f"Cleaning Tests for {taxi_type} trips in {TRIPS_TABLE}:")
+
+        print(f"Number of duplicate rows removed: {dupes}")
+        print(f"Number of trips with 0 passengers removed: {zero_passengers}")
+        print(f"Number of trips 0 miles long removed: {zero_trip}")
+        print(f"Number of trips with > 100 miles removed: {long_distance}")
+        print(f"Number of trips lasting longer than one day removed: {long_duration}")
+        logger.info(f"Removed - duplicates: {dupes}, 0 passengers: {zero_passengers}, "
+                    f"0 miles: {zero_trip}, > 100 miles: {long_distance}, > 1 day: {long_duration}")
+
+        print(f"Months where removed + kept rows don't add up: {unbalanced}")
+        logger.info(f"Months where removed + kept rows don't add up: {unbalanced}")
+        print(f"Months where cleaned rows don't match the loaded file: {mismatched}")
+        logger.info(f"Months where cleaned rows don't match the loaded file: {mismatched}")
+        print(f"Rows in {TRIPS_TABLE}: {table_rows:,} (report: {rows_out:,})")
+        logger.info(f"{taxi_type} rows in {TRIPS_TABLE}: {table_rows:,} (report: {rows_out:,})")
+
+        if unbalanced or mismatched or table_rows != rows_out:
+            logger.warning(f"Cleaning report for {taxi_type} trips does not match {TRIPS_TABLE}")
+
+def clean_parquet_files(check_dedup=False, con=None):
+    """
+    Clean the trip data of the configured fleets in the trips table:
     - Remove any duplicate trips
     - Remove trips with 0 passengers
     - Remove trips with 0 miles in length
     - Remove trips longer than 100 miles in length
     - Remove trips longer than one day in length (86400 seconds)
 
-    Creates cleaned tables: yellow_trips_2024 and green_trips_2024
-    """
-    con = None
+    Only months that load_manifest marks as not yet cleaned are processed; their rows
+    are replaced in place, so rerunning on unchanged data does no work. Rejections per
+    rule are recorded in cleaning_report and verification reads that report.
+    Months are cleaned one at a time; duplicates are found with DEDUP_MODE ('distinct' or 'key').
+    With check_dedup, both dedup modes are compared on every month before it is cleaned.
 
+    Cleans table in place: trips (on con, e.g. the pipeline's, or emissions.duckdb)
+    Returns True if cleaning succeeded.
+    """
     try:
-        # Connect to local DuckDB instance
-        con = duckdb.connect(database='emissions.duckdb', read_only=False)
-        logger.info("Connected to DuckDB instance")
-
-        # Yellow Trips Cleaning
-        print("Cleaning yellow_trips_2024 table...")
-        logger.info("Cleaning yellow_trips_2024 table...")
+        if con is None:
+            # Connect to local DuckDB instance
+            con = instrument.connect("clean", database='emissions.duckdb', read_only=False)
+            logger.info("Connected to DuckDB instance")
 
-        raw_yellow_count = con.execute(f"""
-            -- number of rows in table before cleaning
-            SELECT COUNT(*) FROM yellow_trips_2024;
-        """).fetchone()[0]
+        create_cleaning_report(con)
 
-        con.execute(f"""
-            -- Yellow Trips Cleaning
-            DROP TABLE IF EXISTS yellow_trips_2024_clean;
-            CREATE TABLE yellow_trips_2024_clean AS
-            SELECT DISTINCT * 
-            FROM yellow_trips_2024
-            WHERE passenger_count > 0
-                AND trip_distance > 0
-                AND trip_distance <= 100
-                AND date_diff('second', tpep_pickup_datetime, tpep_dropoff_datetime) <= 86400;
-            
-            DROP TABLE yellow_trips_2024;
-            ALTER TABLE yellow_trips_2024_clean RENAME TO yellow_trips_2024;
-	    """)
-        print("Cleaned yellow_trips_2024 table created.")
-        logger.info("Cleaned yellow_trips_2024 table created.")
-
-        y_rows = con.execute(f"""
-            -- number of rows in cleaned table
-            SELECT COUNT(*) FROM yellow_trips_2024;
-        """).fetchone()[0]
-        print(f"Cleaned yellow_trips_2024 rows: {y_rows:,}")
-        print(f"Yellow rows removed during cleaning: {raw_yellow_count - y_rows:,}")
-        logger.info(f"Yellow rows removed during cleaning: {raw_yellow_count - y_rows:,}")
-
-        # Green Trips Cleaning
-        print("\nCleaning green_trips_2024 table...")
-        logger.info("Cleaning green_trips_2024 table...")
-
-        raw_green_count = con.execute(f"""
-            -- number of rows in table before cleaning
-            SELECT COUNT(*) FROM green_trips_2024;
-        """).fetchone()[0]
+        # Trips Cleaning (every configured fleet)
+        print(f"Cleaning {TRIPS_TABLE} table...")
+        logger.info(f"Cleaning {TRIPS_TABLE} table...")
+        clean_trips(con, check_dedup)
 
-        con.execute(f"""
-            -- Green Trips Cleaning
-            DROP TABLE IF EXISTS green_trips_2024_clean;
-            CREATE TABLE green_trips_2024_clean AS
-            SELECT DISTINCT * 
-            FROM green_trips_2024
-            WHERE passenger_count > 0
-                AND trip_distance > 0
-                AND trip_distance <= 100
-                AND date_diff('second', lpep_pickup_datetime, lpep_dropoff_datetime) <= 86400;
-
-            DROP TABLE green_trips_2024;
-            ALTER TABLE green_trips_2024_clean RENAME TO green_trips_2024;
-	    """)
-        print("Cleaned green_trips_2024 table created.")
-        logger.info("Cleaned green_trips_2024 table created.")
-
-        g_rows = con.execute(f"""
-            -- number of rows in cleaned table
-            SELECT COUNT(*) FROM green_trips_2024;
-        """).fetchone()[0]
-        print(f"Cleaned green_trips_2024 rows: {g_rows:,}")
-        print(f"Green rows removed during cleaning: {raw_green_count - g_rows:,}")
-        logger.info(f"Green rows removed during cleaning: {raw_green_count - g_rows:,}")
-
-        # Cleaning verification 
-        def cleaning_tests(table, pickup, dropoff):
-            print(f"\nCleaning Tests for {table}:")
-            logger.info(f"Cleaning Tests for {table}:")
-
-            # Check for duplicate trips
-            total = con.execute(f"""
-                SELECT COUNT(*) FROM {table};
-            """).fetchone()[0]
-            distinct_count = con.execute(f"""
-                SELECT COUNT(*) FROM (SELECT DISTINCT * FROM {table});
-            """).fetchone()[0]
-
-            # duplicates = total - distinct(*)
-            dupes = total - distinct_count
-            print(f"Number of duplicate rows: {dupes}")
-            logger.info(f"Number of duplicate rows: {dupes}")
-
-            # Check for trips with 0 passengers
-            zero_passengers = con.execute(f"""
-                SELECT COUNT(*) FROM {table} WHERE passenger_count = 0;
-            """).fetchone()[0]
-            print(f"Number of trips with 0 passengers: {zero_passengers}")
-            logger.info(f"Number of trips with 0 passengers: {zero_passengers}")
-
-            # Check for trips <= 0 miles
-            zero_trip = con.execute(f"""
-                SELECT COUNT(*) FROM {table} WHERE trip_distance <= 0;
-            """).fetchone()[0]
-            print(f"Number of trips 0 miles long: {zero_trip}")
-            logger.info(f"Number of trips 0 miles long: {zero_trip}")
-
-            # Check for trip distance > 100 miles
-            long_distance = con.execute(f"""
-                SELECT COUNT(*) FROM {table} WHERE trip_distance > 100;
-            """).fetchone()[0]
-            print(f"Number of trips with > 100 miles: {long_distance}")
-            logger.info(f"Number of trips with > 100 miles: {long_distance}")
-
-            # Check for trip duration > 24 hours (86400 seconds)
-            long_duration = con.execute(f"""
-                SELECT COUNT(*) FROM {table} 
-                WHERE date_diff('second', {pickup}, {dropoff}) > 86400;
-            """).fetchone()[0]
-            print(f"Number of trips lasting longer than one day: {long_duration}")
-            logger.info(f"Number of trips lasting longer than one day: {long_duration}")
-
-        cleaning_tests("yellow_trips_2024", "tpep_pickup_datetime", "tpep_dropoff_datetime")
-        cleaning_tests("green_trips_2024", "lpep_pickup_datetime", "lpep_dropoff_datetime")
+        # Cleaning verification
+        cleaning_tests(con)
+        return True
 
     except Exception as e:
         print(f"An error occurred: {e}")
         logger.error(f"An error occurred: {e}")
+        return False
 
 if __name__ == "__main__":
-    clean_parquet_files()
+    logging.basicConfig(
+        level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s',
+        filename='logs/clean.log'
+    )
+    parser = argparse.ArgumentParser(description="Clean the trips table")
+    parser.add_argument("--check-dedup", action="store_true",
+                        help="compare trip key dedup with SELECT DISTINCT * on each month before cleaning it")
+    args = parser.parse_args()
+
+    clean_parquet_files(check_dedup=args.check_dedup)
     print("Data cleaning complete.")
-    logger.info("Data cleaning complete.")
\ No newline at end of file
+    logger.info("Data cleaning complete.")
@@ -0,0 +1,82 @@
+"""
+Shared fixtures of the pipeline tests. Run from the repository root:
+    python -m pytest scripts
+"""
+import os
+import shutil
+
+import duckdb
+import pytest
+
+# the scripts read and write paths relative to the repository root (logs/, data/, dbt/)
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.chdir(ROOT)
+os.makedirs("logs", exist_ok=True)
+
+import clean
+import generate_data
+import load
+
+@pytest.fixture(scope="session")
+def synthetic_dir(tmp_path_factory):
+    """A small synthetic 2024 data set: ~1,200 trips, 95 yellow and 5 green a month"""
+    out_dir = str(tmp_path_factory.mktemp("synthetic"))
+    con = duckdb.connect()
+    generate_data.generate(out_dir, 1200, con=con)
+    return out_dir
+
+@pytest.fixture
+def con():
+    """In-memory DuckDB connection"""
+    con = duckdb.connect()
+    yield con
+    con.close()
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """Connection to a DuckDB file that the dbt models build in too (DUCKDB_DATABASE)"""
+    path = str(tmp_path / "emissions.duckdb")
+    monkeypatch.setenv("DUCKDB_DATABASE", path)
+    con = duckdb.connect(path)
+    yield con
+    con.close()
+
+def source_files(out_dir, taxi_type, months):
+    """load.resolve_source_files style records of synthetic files, fingerprinted like load.changed_files"""
+    files = [
+        {"taxi_type": taxi_type, "source_month": month, "etag": None,
+         "path": os.path.join(out_dir, load.source_file_name(taxi_type, month))}
+        for month in months
+    ]
+    for f in files:
+        stat = os.stat(f["path"])
+        f["size_bytes"], f["mtime_ns"], f["checksum"] = stat.st_size, stat.st_mtime_ns, load.file_checksum(f["path"])
+    return files
+
+def load_months(con, out_dir, months, taxi_types=("yellow", "green")):
+    """Create load_manifest and the trips table on con and load the given months of synthetic files"""
+    load.create_manifest(con)
+    load.create_trips_table(con)
+    files = [f for taxi_type in taxi_types for f in source_files(out_dir, taxi_type, months)]
+    load.replace_months(con, files)
+    return files
+
+def prepare_months(con, synthetic_dir, out_dir, months):
+    """Copy months of the synthetic data to out_dir, then load and clean them into con"""
+    os.makedirs(out_dir, exist_ok=True)
+    for taxi_type in ("yellow", "green"):
+        for month in months:
+            name = load.source_file_name(taxi_type, month)
+            shutil.copy(os.path.join(synthetic_dir, name), os.path.join(out_dir, name))
+    load.load_vehicle_emissions(con)
+    load_months(con, out_dir, months)
+    clean.create_cleaning_report(con)
+    clean.clean_trips(con)
+
+def reload_month(con, out_dir, taxi_type, month, rows):
+    """Replace a month's source file in out_dir with its first rows, then reload and clean it"""
+    path = os.path.join(out_dir, load.source_file_name(taxi_type, month))
+    con.execute(f"COPY (SELECT * FROM read_parquet('{path}') LIMIT {rows}) TO '{path}.new' (FORMAT parquet);")
+    os.replace(path + ".new", path)
+    load.replace_months(con, source_files(out_dir, taxi_type, [month]))
+    clean.clean_trips(con)
@@ -0,0 +1,103 @@
+import logging
+import os
+import shutil
+
+import instrument
+
+logger = logging.getLogger(__name__)
+
+TRANSFORMED = "trips_transformed"
+
+# Export configuration (override with environment variables)
+# - EXPORT_DIR: root of the hive partitioned parquet dataset
+# - EXPORT_ROW_GROUP_SIZE: rows per parquet row group (min/max statistics are kept per row group)
+EXPORT_DIR = os.environ.get("EXPORT_DIR", "export/trips")
+ROW_GROUP_SIZE = int(os.environ.get("EXPORT_ROW_GROUP_SIZE", "122880"))
+
+def pending_exports(con):
+    """(taxi_type, source_month) pairs transformed since they were last exported"""
+    return con.execute("""
+        SELECT taxi_type, source_month FROM load_manifest
+        WHERE transformed_at IS NOT NULL
+            AND (exported_at IS NULL OR exported_at < transformed_at)
+        ORDER BY taxi_type, source_month;
+    """).fetchall()
+
+def partition_dir(taxi_type, source_month):
+    """Directory of one taxi_type/year/month partition of the export"""
+    year, month = source_month.split("-")
+    return os.path.join(EXPORT_DIR, f"taxi_type={taxi_type}", f"year={int(year)}", f"month={int(month)}")
+
+def export_partitions(con, partitions):
+    """
+    Write the transformed trips of each given (taxi_type, source_month) partition to
+    EXPORT_DIR/taxi_type=.../year=.../month=.../trips_0.parquet with its own COPY:
+    - rows are sorted by pickup time, so row group min/max statistics on pickup_datetime
+      do not overlap and readers can skip row groups (a single COPY with PARTITION_BY
+      spreads each partition over several threads and loses that order)
+    - taxi_type, year and month are left to the directory names as with PARTITION_BY
+    - zstd compression
+    Existing files of a partition are removed first so a reexported month never leaves
+    stale files behind.
+    """
+    for taxi_type, source_month in partitions:
+        path = partition_dir(taxi_type, source_month)
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path)
+
+        con.execute(f"""
+            COPY (
+                SELECT * EXCLUDE (taxi_type)
+                FROM {TRANSFORMED}
+                WHERE CAST(taxi_type AS VARCHAR) = ? AND source_month = ?
+                ORDER BY pickup_datetime
+            ) TO '{os.path.join(path, 'trips_0.parquet')}' (
+                FORMAT parquet,
+                COMPRESSION zstd,
+                ROW_GROUP_SIZE {ROW_GROUP_SIZE}
+            );
+        """, [taxi_type, source_month])
+
+    con.execute("""
+        UPDATE load_manifest SET exported_at = now()
+        WHERE list_contains(?, taxi_type || '/' || source_month);
+    """, [[f"{t}/{m}" for t, m in partitions]])
+
+def export_parquet_files(con=None):
+    """
+    Export the transformed trips to a hive partitioned parquet dataset (taxi_type/year/month)
+    that other tools can read without opening emissions.duckdb:
+        SELECT ... FROM read_parquet('export/trips/*/*/*/*.parquet', hive_partitioning=true)
+    Only partitions transformed since their last export are written.
+    Returns True if it succeeded.
+    """
+    try:
+        if con is None:
+            # Connect to local DuckDB instance
+            con = instrument.connect("export", database='emissions.duckdb', read_only=False)
+            logger.info("Connected to DuckDB instance")
+
+        partitions = pending_exports(con)
+        if not partitions:
+            print(f"{EXPORT_DIR}: no new partitions to export")
+            logger.info(f"{EXPORT_DIR}: no new partitions to export")
+            return True
+
+        export_partitions(con, partitions)
+        print(f"Exported {len(partitions)} partitions to {EXPORT_DIR}")
+        logger.info(f"Exported {len(partitions)} partitions to {EXPORT_DIR}: {partitions}")
+        return True
+
+    except Exception as e:
+        print(f"An error occurred: {e}")
+        logger.error(f"An error occurred: {e}")
+        return False
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s',
+        filename='logs/export.log'
+    )
+    export_parquet_files()
+    print("Data export complete.")
+    logger.info("Data export complete.")
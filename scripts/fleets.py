@@ -0,0 +1,102 @@
+import os
+import re
+
+# Years and fleets the pipeline covers (override with environment variables)
+# - PIPELINE_YEARS: one year ('2024') or an inclusive range ('2019-2025')
+# - PIPELINE_FLEETS: comma separated fleets from FLEETS ('yellow,green,fhvhv')
+# The trips tables hold every configured year and fleet; taxi_type is the fleet.
+
+# TLC trip record fleets the pipeline can price, with:
+# - file: file name prefix, <file>_<year>-<month>.parquet
+# - first_month: first month published with the columns read below (zone ids since 2016-07,
+#   high volume FHV files since 2019-02)
+# - columns: source column for each trips column (None when the fleet has no such column)
+# - passengers: False when the fleet does not report passenger_count, so the zero
+#   passengers cleaning rule does not apply
+FLEETS = {
+    "yellow": {
+        "file": "yellow_tripdata",
+        "first_month": "2016-07",
+        "passengers": True,
+        "columns": {
+            "vendor_id": "VendorID",
+            "pickup_datetime": "tpep_pickup_datetime",
+            "dropoff_datetime": "tpep_dropoff_datetime",
+            "passenger_count": "passenger_count",
+            "trip_distance": "trip_distance",
+            "pu_location_id": "PULocationID",
+            "do_location_id": "DOLocationID",
+            "store_and_fwd_flag": "store_and_fwd_flag",
+            "fare_amount": "fare_amount",
+        },
+    },
+    "green": {
+        "file": "green_tripdata",
+        "first_month": "2016-07",
+        "passengers": True,
+        "columns": {
+            "vendor_id": "VendorID",
+            "pickup_datetime": "lpep_pickup_datetime",
+            "dropoff_datetime": "lpep_dropoff_datetime",
+            "passenger_count": "passenger_count",
+            "trip_distance": "trip_distance",
+            "pu_location_id": "PULocationID",
+            "do_location_id": "DOLocationID",
+            "store_and_fwd_flag": "store_and_fwd_flag",
+            "fare_amount": "fare_amount",
+        },
+    },
+    # High volume for-hire vehicles (Uber, Lyft, Via, Juno). vendor_id keeps the number of
+    # the company's license (HV0003 -> 3), which the dbt models map to its emission factors.
+    "fhvhv": {
+        "file": "fhvhv_tripdata",
+        "first_month": "2019-02",
+        "passengers": False,
+        "columns": {
+            "vendor_id": "right(hvfhs_license_num, 1)",
+            "pickup_datetime": "pickup_datetime",
+            "dropoff_datetime": "dropoff_datetime",
+            "passenger_count": None,
+            "trip_distance": "trip_miles",
+            "pu_location_id": "PULocationID",
+            "do_location_id": "DOLocationID",
+            "store_and_fwd_flag": None,
+            "fare_amount": "base_passenger_fare",
+        },
+    },
+}
+
+# Fleets with trip records that can't be priced
+UNPRICEABLE = {
+    "fhv": "FHV trip records have no trip distance, so their CO2 can't be priced",
+}
+
+def parse_years(spec):
+    """Years of a PIPELINE_YEARS value: '2024' or an inclusive range '2019-2025'"""
+    match = re.fullmatch(r"\s*(\d{4})\s*(?:-\s*(\d{4}))?\s*", spec)
+    if not match:
+        raise ValueError(f"Invalid PIPELINE_YEARS: {spec}")
+    first, last = int(match.group(1)), int(match.group(2) or match.group(1))
+    if last < first:
+        raise ValueError(f"Invalid PIPELINE_YEARS: {spec}")
+    return list(range(first, last + 1))
+
+def parse_fleets(spec):
+    """Fleets of a PIPELINE_FLEETS value, e.g. 'yellow,green,fhvhv'"""
+    names = [name.strip() for name in spec.split(",") if name.strip()]
+    for name in names:
+        if name in UNPRICEABLE:
+            raise ValueError(f"Fleet {name} is not supported: {UNPRICEABLE[name]}")
+        if name not in FLEETS:
+            raise ValueError(f"Unknown fleet {name}, expected some of {', '.join(FLEETS)}")
+    return names
+
+YEARS = parse_years(os.environ.get("PIPELINE_YEARS", "2024"))
+TAXI_TYPES = parse_fleets(os.environ.get("PIPELINE_FLEETS", "yellow,green"))
+
+def source_months(taxi_type, years=YEARS):
+    """'YYYY-MM' months of the given years a fleet has trip records for"""
+    return [
+        f"{year}-{month:02d}" for year in years for month in range(1, 13)
+        if f"{year}-{month:02d}" >= FLEETS[taxi_type]["first_month"]
+    ]
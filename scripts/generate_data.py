@@ -0,0 +1,171 @@
+import argparse
+import duckdb
+import logging
+import os
+
+import resources
+
+logger = logging.getLogger(__name__)
+
+# Share of all generated rows per taxi type (2024 TLC data is roughly 95% yellow)
+TAXI_SHARE = {"yellow": 0.95, "green": 0.05}
+
+# Rates of dirty rows, matching the conditions clean.py removes
+DIRT = {
+    "duplicate": 0.01,         # exact copy of another trip
+    "zero_passengers": 0.015,  # passenger_count = 0
+    "null_passengers": 0.03,   # passenger_count missing
+    "zero_distance": 0.02,     # trip_distance = 0
+    "over_100_miles": 0.0001,  # trip_distance > 100
+    "over_1_day": 0.0001,      # dropoff more than 86400 seconds after pickup
+}
+
+# Columns of the real TLC files, in file order, for each taxi type. {p} is tpep or lpep.
+SCHEMAS = {
+    "yellow": [
+        ("VendorID", "INTEGER"), ("{p}_pickup_datetime", "TIMESTAMP"), ("{p}_dropoff_datetime", "TIMESTAMP"),
+        ("passenger_count", "BIGINT"), ("trip_distance", "DOUBLE"), ("RatecodeID", "BIGINT"),
+        ("store_and_fwd_flag", "VARCHAR"), ("PULocationID", "INTEGER"), ("DOLocationID", "INTEGER"),
+        ("payment_type", "BIGINT"), ("fare_amount", "DOUBLE"), ("extra", "DOUBLE"), ("mta_tax", "DOUBLE"),
+        ("tip_amount", "DOUBLE"), ("tolls_amount", "DOUBLE"), ("improvement_surcharge", "DOUBLE"),
+        ("total_amount", "DOUBLE"), ("congestion_surcharge", "DOUBLE"), ("Airport_fee", "DOUBLE"),
+    ],
+    "green": [
+        ("VendorID", "INTEGER"), ("{p}_pickup_datetime", "TIMESTAMP"), ("{p}_dropoff_datetime", "TIMESTAMP"),
+        ("store_and_fwd_flag", "VARCHAR"), ("RatecodeID", "BIGINT"), ("PULocationID", "INTEGER"),
+        ("DOLocationID", "INTEGER"), ("passenger_count", "BIGINT"), ("trip_distance", "DOUBLE"),
+        ("fare_amount", "DOUBLE"), ("extra", "DOUBLE"), ("mta_tax", "DOUBLE"), ("tip_amount", "DOUBLE"),
+        ("tolls_amount", "DOUBLE"), ("ehail_fee", "DOUBLE"), ("improvement_surcharge", "DOUBLE"),
+        ("total_amount", "DOUBLE"), ("payment_type", "BIGINT"), ("trip_type", "BIGINT"),
+        ("congestion_surcharge", "DOUBLE"),
+    ],
+}
+COLUMN_PREFIX = {"yellow": "tpep", "green": "lpep"}
+
+def uniform(seed, *salt):
+    """SQL expression for a deterministic pseudo random number in [0, 1) per row i"""
+    args = ", ".join(str(s) for s in (seed,) + salt)
+    return f"((hash(i, {args}) % 1000000) / 1000000.0)"
+
+def month_sql(taxi_type, year, month, rows, seed):
+    """
+    Query producing one month of synthetic trips with the real TLC schema of a taxi type.
+    Every value is derived from hash(row number, seed), so output is deterministic.
+    """
+    p = COLUMN_PREFIX[taxi_type]
+    u = lambda *salt: uniform(seed, year, month, *salt)
+    start = f"TIMESTAMP '{year}-{month:02d}-01'"
+    seconds_in_month = f"date_diff('second', {start}, {start} + INTERVAL 1 MONTH)"
+
+    # cumulative dirt thresholds on one uniform draw, so each dirty row has one problem
+    t_zero_p = DIRT["zero_passengers"]
+    t_null_p = t_zero_p + DIRT["null_passengers"]
+    t_zero_d = t_null_p + DIRT["zero_distance"]
+    t_far = t_zero_d + DIRT["over_100_miles"]
+    t_long = t_far + DIRT["over_1_day"]
+
+    values = {
+        "VendorID": f"CAST(1 + floor({u(1)} * 2) AS INTEGER)",
+        "{p}_pickup_datetime": "pickup",
+        "{p}_dropoff_datetime": f"""pickup + to_seconds(CAST(CASE
+            WHEN dirt >= {t_far} AND dirt < {t_long} THEN 86400 + floor({u(2)} * 86400)
+            ELSE 120 + floor(distance * (150 + {u(3)} * 250))
+        END AS BIGINT))""",
+        "passenger_count": f"""CASE
+            WHEN dirt < {t_zero_p} THEN 0
+            WHEN dirt < {t_null_p} THEN NULL
+            ELSE CAST(1 + floor(pow({u(4)}, 3) * 6) AS BIGINT)
+        END""",
+        "trip_distance": f"""CASE
+            WHEN dirt >= {t_null_p} AND dirt < {t_zero_d} THEN 0.0
+            WHEN dirt >= {t_zero_d} AND dirt < {t_far} THEN 100 + round({u(5)} * 400, 2)
+            ELSE distance
+        END""",
+        "RatecodeID": "1",
+        "store_and_fwd_flag": f"CASE WHEN {u(6)} < 0.005 THEN 'Y' ELSE 'N' END",
+        "PULocationID": f"CAST(1 + floor({u(7)} * 265) AS INTEGER)",
+        "DOLocationID": f"CAST(1 + floor({u(8)} * 265) AS INTEGER)",
+        "payment_type": f"CAST(1 + floor({u(9)} * 2) AS BIGINT)",
+        "fare_amount": "round(3.0 + distance * 2.5, 2)",
+        "extra": "1.0",
+        "mta_tax": "0.5",
+        "tip_amount": f"round(distance * {u(10)}, 2)",
+        "tolls_amount": "0.0",
+        "ehail_fee": "NULL",
+        "improvement_surcharge": "1.0",
+        "total_amount": "round(5.5 + distance * 2.5, 2)",
+        "congestion_surcharge": "2.5",
+        "Airport_fee": "0.0",
+        "trip_type": "1",
+    }
+    columns = ", ".join(
+        f"CAST({values[name]} AS {type_}) AS {name.format(p=p)}" for name, type_ in SCHEMAS[taxi_type]
+    )
+
+    # pickups are spread over the month; distances are roughly exponential (mean ~3 miles)
+    return f"""
+        WITH draws AS (
+            SELECT
+                i,
+                {start} + to_seconds(CAST(floor({u(11)} * {seconds_in_month}) AS BIGINT)) AS pickup,
+                round(least(-ln(1 - {u(12)}) * 3.0, 60.0) + 0.1, 2) AS distance,
+                {u(13)} AS dirt
+            FROM range({rows}) t(i)
+        ),
+        trips AS (
+            SELECT i, {columns} FROM draws
+        )
+        SELECT * EXCLUDE (i) FROM trips
+        UNION ALL
+        SELECT * EXCLUDE (i) FROM trips WHERE {u(14)} < {DIRT['duplicate']}
+    """
+
+def generate(out_dir, total_rows, year=2024, seed=42, con=None):
+    """
+    Write <taxi>_tripdata_<year>-<month>.parquet files for yellow and green trips into
+    out_dir, about total_rows rows in all (plus duplicates). Existing files are kept,
+    so a data set is only generated once per directory.
+    Returns the number of rows in the data set.
+    """
+    if con is None:
+        con = duckdb.connect()
+        resources.apply_resource_profile(con)
+    os.makedirs(out_dir, exist_ok=True)
+    rows = 0
+
+    for taxi_type, share in TAXI_SHARE.items():
+        month_rows = max(1, int(total_rows * share / 12))
+        for month in range(1, 13):
+            path = os.path.join(out_dir, f"{taxi_type}_tripdata_{year}-{month:02d}.parquet")
+            if not os.path.exists(path):
+                con.execute(f"""
+                    COPY ({month_sql(taxi_type, year, month, month_rows, seed)})
+                    TO '{path}.tmp' (FORMAT parquet, COMPRESSION zstd);
+                """)
+                os.replace(path + ".tmp", path)
+                logger.info(f"Generated {path}")
+            rows += con.execute("""
+                SELECT SUM(num_rows) FROM parquet_file_metadata(?);
+            """, [path]).fetchone()[0]
+
+    return rows
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s',
+        filename='logs/generate_data.log'
+    )
+    parser = argparse.ArgumentParser(description="Generate synthetic yellow/green TLC trip parquet files")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="approximate number of trips in the year")
+    parser.add_argument("--out", default="data/synthetic", help="directory for the monthly parquet files")
+    parser.add_argument("--year", type=int, default=2024)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    try:
+        rows = generate(args.out, args.rows, args.year, args.seed)
+        print(f"Generated {rows:,} rows in {args.out}")
+        logger.info(f"Generated {rows:,} rows in {args.out}")
+    except Exception as e:
+        print(f"An error occurred: {e}")
+        logger.error(f"An error occurred: {e}")
@@ -0,0 +1,255 @@
+import argparse
+import atexit
+import collections
+import datetime
+import itertools
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+
+import duckdb
+
+import resources
+
+logger = logging.getLogger(__name__)
+
+# One metrics file per stage run: <METRICS_DIR>/<stage>-<run id>.jsonl, one JSON line per query
+METRICS_DIR = os.environ.get("METRICS_DIR", "logs/metrics")
+
+# Queries slower than this many seconds also get their DuckDB profile (JSON, and the
+# EXPLAIN ANALYZE style query tree) written to PROFILE_DIR; unset means never
+PROFILE_THRESHOLD_SECONDS = os.environ.get("PROFILE_THRESHOLD_SECONDS")
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "logs/profiles")
+
+# DuckDB profiling metrics recorded per query, keyed by their name in the metrics file
+PROFILE_METRICS = {
+    "latency": "latency",
+    "cpu_seconds": "cpu_time",
+    "rows_scanned": "cumulative_rows_scanned",
+    "rows_returned": "rows_returned",
+    "bytes_read": "total_bytes_read",
+    "bytes_written": "total_bytes_written",
+}
+
+# DuckDB's buffer memory and temp directory peaks are high-water marks over the
+# connection's lifetime, not the query's: a query is recorded with how far it raised them
+PEAK_METRICS = {
+    "peak_memory_increase_bytes": "system_peak_buffer_memory",
+    "spill_increase_bytes": "system_peak_temp_dir_size",
+}
+
+_write_lock = threading.Lock()
+
+def query_key(caller, query):
+    """Stable name of a query across runs: calling function and the start of its SQL"""
+    sql = re.sub(r"\s+", " ", query).strip()
+    return f"{caller}: {sql[:80]}"
+
+class InstrumentedConnection:
+    """
+    DuckDB connection wrapper recording wall time and DuckDB's profiling metrics for
+    every execute() to the stage run's metrics file. Other methods (begin, commit,
+    close, ...) go straight to the wrapped connection.
+
+    DuckDB only completes a query's profile once its result is fully fetched, so a
+    query is recorded after its fetch, and fetchone/fetchmany read the (small) result
+    in one go and hand it out from a buffer.
+    """
+
+    def __init__(self, con, stage, run_id, sequence=None, metrics_path=None):
+        self._con = con
+        self.stage = stage
+        self.run_id = run_id
+        self.metrics_path = metrics_path or os.path.join(METRICS_DIR, f"{stage}-{run_id}.jsonl")
+        self._sequence = sequence or itertools.count(1)
+        self._pending = None
+        self._buffer = None
+        self._peaks = dict.fromkeys(PEAK_METRICS, 0)
+        con.execute("SET enable_profiling = 'no_output';")
+        atexit.register(self._record)
+
+    def __getattr__(self, name):
+        return getattr(self._con, name)
+
+    def cursor(self, stage=None):
+        """Cursor recording to the same metrics file, its queries tagged with stage if given"""
+        return InstrumentedConnection(
+            self._con.cursor(), stage or self.stage, self.run_id, self._sequence, self.metrics_path
+        )
+
+    def execute(self, query, parameters=None):
+        self._record()
+        caller = sys._getframe(1).f_code.co_name
+        start = time.perf_counter()
+        self._con.execute(query, parameters)
+        seconds = time.perf_counter() - start
+
+        self._buffer = None
+        self._pending = {
+            "seq": next(self._sequence),
+            "stage": self.stage,
+            "caller": caller,
+            "key": query_key(caller, query),
+            "query": query.strip(),
+            "seconds": round(seconds, 6),
+        }
+        # statements without a result set (DDL, DML, COPY) are profiled completely already
+        self._record(wait_for_fetch=True)
+        return self
+
+    def fetchall(self):
+        if self._buffer is not None:
+            rows = list(self._buffer)
+            self._buffer.clear()
+            return rows
+        rows = self._con.fetchall()
+        self._record()
+        return rows
+
+    def fetchone(self):
+        buffer = self._buffered()
+        return buffer.popleft() if buffer else None
+
+    def fetchmany(self, size=1):
+        buffer = self._buffered()
+        return [buffer.popleft() for _ in range(min(size, len(buffer)))]
+
+    def _buffered(self):
+        if self._buffer is None:
+            self._buffer = collections.deque(self._con.fetchall())
+            self._record()
+        return self._buffer
+
+    def _fetch(name):
+        def fetch(self, *args, **kwargs):
+            result = getattr(self._con, name)(*args, **kwargs)
+            self._record()
+            return result
+        fetch.__name__ = name
+        return fetch
+
+    fetchdf = _fetch("fetchdf")
+    df = _fetch("df")
+    fetch_df = _fetch("fetch_df")
+    fetchnumpy = _fetch("fetchnumpy")
+    arrow = _fetch("arrow")
+    fetch_arrow_table = _fetch("fetch_arrow_table")
+    pl = _fetch("pl")
+    del _fetch
+
+    def _profile(self):
+        """JSON profile of the last query, or None if DuckDB has not completed it yet"""
+        try:
+            profile = json.loads(self._con.get_profiling_information(format="json"))
+        except (duckdb.Error, ValueError):
+            return None
+        return profile if profile.get("latency") else None
+
+    def _record(self, wait_for_fetch=False):
+        """Append the pending query to the metrics file, with its profile if available"""
+        entry = self._pending
+        if entry is None:
+            return
+        profile = self._profile()
+        if profile is None and wait_for_fetch:
+            return
+        self._pending = None
+
+        for name, metric in PROFILE_METRICS.items():
+            entry[name] = profile.get(metric) if profile else None
+        for name, metric in PEAK_METRICS.items():
+            peak = profile.get(metric) if profile else None
+            entry[name] = max(peak - self._peaks[name], 0) if peak is not None else None
+            self._peaks[name] = max(self._peaks[name], peak or 0)
+        if profile and PROFILE_THRESHOLD_SECONDS and entry["seconds"] >= float(PROFILE_THRESHOLD_SECONDS):
+            entry["profile"] = self._save_profile(entry["seq"], profile)
+
+        with _write_lock:
+            os.makedirs(METRICS_DIR, exist_ok=True)
+            with open(self.metrics_path, "a") as f:
+                f.write(json.dumps(entry, default=str) + "\n")
+
+    def _save_profile(self, seq, profile):
+        """Write the JSON profile and query tree of a slow query, returning the JSON path"""
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = os.path.join(PROFILE_DIR, f"{self.stage}-{self.run_id}-{seq:04d}")
+        with open(path + ".json", "w") as f:
+            json.dump(profile, f, indent=2)
+        with open(path + ".txt", "w") as f:
+            f.write(self._con.get_profiling_information(format="query_tree"))
+        logger.info(f"Saved profile of slow query {seq} to {path}.json")
+        return path + ".json"
+
+def connect(stage, database='emissions.duckdb', read_only=False):
+    """
+    duckdb.connect() for a pipeline stage, returning a connection that records every
+    query to a new metrics file, logs/metrics/<stage>-<timestamp>.jsonl
+    The resource profile (memory limit, threads, ...) is applied before it is returned.
+    """
+    run_id = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+    con = duckdb.connect(database=database, read_only=read_only)
+    resources.apply_resource_profile(con)
+    con = InstrumentedConnection(con, stage, run_id)
+    logger.info(f"Recording query metrics to {con.metrics_path}")
+    return con
+
+def summarize(path):
+    """
+    Per query key totals of a metrics file: count, seconds, and how far the queries raised
+    the connection's peak memory and spill (summed over all keys, the stage's peaks)
+    """
+    totals = {}
+    with open(path) as f:
+        for line in f:
+            entry = json.loads(line)
+            total = totals.setdefault(entry["key"], {"count": 0, "seconds": 0.0, **dict.fromkeys(PEAK_METRICS, 0)})
+            total["count"] += 1
+            total["seconds"] += entry["seconds"]
+            for name in PEAK_METRICS:
+                total[name] += entry.get(name) or 0
+    return totals
+
+def diff(old_path, new_path, top=20):
+    """Print the queries whose total time changed most between two metrics files"""
+    old, new = summarize(old_path), summarize(new_path)
+    empty = {"count": 0, "seconds": 0.0, **dict.fromkeys(PEAK_METRICS, 0)}
+    rows = sorted(
+        ((key, old.get(key, empty), new.get(key, empty)) for key in old.keys() | new.keys()),
+        key=lambda r: abs(r[2]["seconds"] - r[1]["seconds"]), reverse=True
+    )
+    print(f"{'old s':>9} {'new s':>9} {'delta':>9} {'+peak MB':>8} {'+spill MB':>9}  query")
+    for key, o, n in rows[:top]:
+        print(f"{o['seconds']:9.3f} {n['seconds']:9.3f} {n['seconds'] - o['seconds']:+9.3f} "
+              f"{n['peak_memory_increase_bytes'] / 2**20:8.1f} {n['spill_increase_bytes'] / 2**20:9.1f}  {key} (x{n['count']})")
+    old_total = sum(o["seconds"] for o in old.values())
+    new_total = sum(n["seconds"] for n in new.values())
+    print(f"{old_total:9.3f} {new_total:9.3f} {new_total - old_total:+9.3f} "
+          f"{sum(n['peak_memory_increase_bytes'] for n in new.values()) / 2**20:8.1f} "
+          f"{sum(n['spill_increase_bytes'] for n in new.values()) / 2**20:9.1f}  total (new peaks)")
+
+def show(path, top=20):
+    """Print the slowest queries of one metrics file"""
+    totals = summarize(path)
+    rows = sorted(totals.items(), key=lambda r: r[1]["seconds"], reverse=True)
+    print(f"{'seconds':>9} {'+peak MB':>8} {'+spill MB':>9}  query")
+    for key, t in rows[:top]:
+        print(f"{t['seconds']:9.3f} {t['peak_memory_increase_bytes'] / 2**20:8.1f} "
+              f"{t['spill_increase_bytes'] / 2**20:9.1f}  {key} (x{t['count']})")
+    print(f"{sum(t['seconds'] for t in totals.values()):9.3f} "
+          f"{sum(t['peak_memory_increase_bytes'] for t in totals.values()) / 2**20:8.1f} "
+          f"{sum(t['spill_increase_bytes'] for t in totals.values()) / 2**20:9.1f}  total (stage peaks)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Show one query metrics file or diff two of them")
+    parser.add_argument("metrics", nargs="+", help="logs/metrics/<stage>-<run>.jsonl; give two to diff them")
+    parser.add_argument("--top", type=int, default=20, help="number of queries to show")
+    args = parser.parse_args()
+
+    if len(args.metrics) == 2:
+        diff(*args.metrics, top=args.top)
+    else:
+        show(args.metrics[0], top=args.top)
@@ -1,133 +1,451 @@
-import duckdb
+import hashlib
 import os
 import logging
+import shutil
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import fleets
+import instrument
+import resources
 
-logging.basicConfig(
-    level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s',
-    filename='logs/load.log'
-)
 logger = logging.getLogger(__name__)
 
-def load_parquet_files():
+# Source configuration (override with environment variables)
+# - TLC_SOURCE_DIR: local mirror holding <taxi>_tripdata_<year>-<month>.parquet files, read in place
+# - TLC_CACHE_DIR: where downloaded files are kept so a month is only downloaded once
+# - TLC_BASE_URL: where missing files are downloaded from (e.g. a local HTTP stand-in)
+# Years and fleets come from PIPELINE_YEARS and PIPELINE_FLEETS (see fleets.py)
+BASE_URL = os.environ.get("TLC_BASE_URL", "https://d37ci6vzurychx.cloudfront.net/trip-data")
+SOURCE_DIR = os.environ.get("TLC_SOURCE_DIR")
+CACHE_DIR = os.environ.get("TLC_CACHE_DIR", "data/cache")
+DOWNLOAD_WORKERS = int(os.environ.get("TLC_DOWNLOAD_WORKERS", "6"))
+CHUNK_SIZE = 1 << 20
+
+# Unified trips table: every year and fleet, normalized column names, only the columns
+# the pipeline uses, narrowed types and dictionary-encoded (ENUM) flags
+TRIPS_TABLE = "trips"
+TAXI_TYPES = fleets.TAXI_TYPES
+TRIPS_COLUMNS = {
+    "taxi_type": "ENUM(" + ", ".join(f"'{name}'" for name in fleets.FLEETS) + ")",
+    "source_month": "VARCHAR",
+    "vendor_id": "TINYINT",
+    "pickup_datetime": "TIMESTAMP",
+    "dropoff_datetime": "TIMESTAMP",
+    "passenger_count": "TINYINT",
+    "trip_distance": "FLOAT",
+    "pu_location_id": "SMALLINT",
+    "do_location_id": "SMALLINT",
+    "store_and_fwd_flag": "ENUM('N', 'Y')",
+    "fare_amount": "FLOAT",
+}
+
+def source_file_name(taxi_type, source_month):
+    """File name used by the TLC for one month of trips, e.g. yellow_tripdata_2024-01.parquet"""
+    return f"{fleets.FLEETS[taxi_type]['file']}_{source_month}.parquet"
+
+def read_etag(path):
+    """ETag recorded next to a cached file when it was downloaded (None if unknown)"""
+    try:
+        with open(path + ".etag") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+def remote_etag(url):
+    """ETag the server currently reports for url, or None when it can't be reached"""
+    try:
+        request = urllib.request.Request(url, method="HEAD")
+        with urllib.request.urlopen(request, timeout=30) as response:
+            return response.headers.get("ETag")
+    except OSError as e:
+        logger.warning(f"Could not check {url} for changes: {e}")
+        return None
+
+def download_file(url, dest):
     """
-    Load yellow and green trip data from 2024 monthly parquet files into DuckDB tables:
-    - Load vehicle_emissions.csv into a DuckDB table named vehicle_emissions
-    - Load all 12 months of yellow taxi trip data for 2024 into a single DuckDB table named yellow_trips_2024
-    - Load all 12 months of green taxi trip data for 2024 into a single DuckDB table named green_trips_2024
-    Creates 3 tables: vehicle_emissions, yellow_trips_2024, green_trips_2024
+    Download url to dest, resuming from a partial dest + '.part' file if a previous
+    download was interrupted. A cached dest is reused unless the server reports a
+    different ETag than the one recorded when it was downloaded.
     """
-    con = None
+    if os.path.exists(dest):
+        cached = read_etag(dest)
+        current = remote_etag(url)
+        if cached is None or current is None or cached == current:
+            return dest
+        logger.info(f"{url} changed upstream ({cached} -> {current}), downloading again")
+        os.remove(dest)
 
+    part = dest + ".part"
+    offset = os.path.getsize(part) if os.path.exists(part) else 0
+    request = urllib.request.Request(url)
+    if offset:
+        request.add_header("Range", f"bytes={offset}-")
+        # only resume if the partial file came from the same version of the file
+        if read_etag(part):
+            request.add_header("If-Range", read_etag(part))
+
+    with urllib.request.urlopen(request) as response:
+        etag = response.headers.get("ETag")
+        # server ignored the range request (or the file changed), start over
+        mode = "ab" if offset and response.status == 206 else "wb"
+        if etag:
+            with open(part + ".etag", "w") as f:
+                f.write(etag)
+        with open(part, mode) as f:
+            shutil.copyfileobj(response, f, CHUNK_SIZE)
+
+    os.replace(part, dest)
+    if os.path.exists(part + ".etag"):
+        os.replace(part + ".etag", dest + ".etag")
+    logger.info(f"Downloaded {url} -> {dest}")
+    return dest
+
+def download_published(url, dest):
+    """download_file, or None if the month is not published (yet): the TLC answers 403/404"""
     try:
-        # Connect to local DuckDB instance
-        con = duckdb.connect(database='emissions.duckdb', read_only=False)
-        logger.info("Connected to DuckDB instance")
+        return download_file(url, dest)
+    except urllib.error.HTTPError as e:
+        if e.code not in (403, 404):
+            raise
+        logger.warning(f"{url} is not published ({e.code}), skipping it")
+        return None
 
-        # vehicle_emissions table
-        con.execute(f"""
-	        DROP TABLE IF EXISTS vehicle_emissions;
-	    """)
-        print("Dropped table if exists: vehicle_emissions")
-        logger.info("Dropped table if exists: vehicle_emissions")
+def resolve_source_files(taxi_type, year):
+    """
+    Return one record (taxi_type, source_month, path, etag) for each monthly file of a
+    taxi type in a year (months before the fleet's first_month are left out):
+    - read straight from SOURCE_DIR when a local mirror is configured
+    - otherwise download new or changed months concurrently into CACHE_DIR; months the
+      TLC has not published yet are skipped
+    """
+    months = fleets.source_months(taxi_type, [year])
+    names = [source_file_name(taxi_type, month) for month in months]
 
+    if SOURCE_DIR:
+        paths = [os.path.join(SOURCE_DIR, n) for n in names]
+        missing = [p for p in paths if not os.path.exists(p)]
+        if missing:
+            raise FileNotFoundError(f"Missing files in {SOURCE_DIR}: {missing}")
+    else:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        jobs = [(f"{BASE_URL}/{n}", os.path.join(CACHE_DIR, n)) for n in names]
+        with ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as pool:
+            paths = list(pool.map(lambda job: download_published(*job), jobs))
+        print(f"{taxi_type} {year} files ready in {CACHE_DIR}")
+        logger.info(f"{taxi_type} {year} files ready in {CACHE_DIR}")
+
+    return [
+        {"taxi_type": taxi_type, "source_month": month, "path": path, "etag": read_etag(path)}
+        for month, path in zip(months, paths)
+        if path is not None
+    ]
+
+def local_source_files(taxi_type, years):
+    """
+    Paths of a taxi type's monthly files already on disk, in SOURCE_DIR or else CACHE_DIR,
+    without downloading anything or asking the server for ETags
+    """
+    folder = SOURCE_DIR or CACHE_DIR
+    paths = [os.path.join(folder, source_file_name(taxi_type, month)) for month in fleets.source_months(taxi_type, years)]
+    return [path for path in paths if os.path.exists(path)]
+
+def file_checksum(path):
+    """md5 of a file's contents, read in chunks"""
+    digest = hashlib.md5()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def sql_list(paths):
+    """Render a python list of paths as a DuckDB list literal"""
+    quoted = ", ".join("'" + p.replace("'", "''") + "'" for p in paths)
+    return f"[{quoted}]"
+
+def create_manifest(con):
+    """
+    load_manifest records every source file that has been loaded, one row per
+    taxi type and month. cleaned_at, transformed_at and exported_at are reset whenever a
+    month is (re)loaded so clean.py, the dbt models and export.py know which months still
+    need work. factor_version is the emission factor version the dbt models priced the
+    month's trips with.
+    """
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS load_manifest (
+            taxi_type VARCHAR,
+            source_month VARCHAR,
+            file_name VARCHAR,
+            size_bytes BIGINT,
+            mtime_ns BIGINT,
+            etag VARCHAR,
+            checksum VARCHAR,
+            row_count BIGINT,
+            loaded_at TIMESTAMP,
+            cleaned_at TIMESTAMP,
+            transformed_at TIMESTAMP,
+            exported_at TIMESTAMP,
+            factor_version VARCHAR,
+            PRIMARY KEY (taxi_type, source_month)
+        );
+
+        -- manifests created by earlier versions of this script
+        ALTER TABLE load_manifest ADD COLUMN IF NOT EXISTS transformed_at TIMESTAMP;
+        ALTER TABLE load_manifest ADD COLUMN IF NOT EXISTS exported_at TIMESTAMP;
+        ALTER TABLE load_manifest ADD COLUMN IF NOT EXISTS mtime_ns BIGINT;
+        ALTER TABLE load_manifest ADD COLUMN IF NOT EXISTS factor_version VARCHAR;
+    """)
+
+def changed_files(con, files):
+    """
+    Fingerprint each source file (size + checksum) and return the ones that are
+    new or differ from what load_manifest says was loaded last time.
+    A file with the size, modification time and ETag recorded in load_manifest is not
+    read again; only the others are checksummed. Files whose contents turn out unchanged
+    get their new modification time recorded so they aren't checksummed next time.
+    """
+    loaded = {
+        (taxi_type, month): (size, mtime_ns, etag, checksum)
+        for taxi_type, month, size, mtime_ns, etag, checksum in con.execute("""
+            SELECT taxi_type, source_month, size_bytes, mtime_ns, etag, checksum FROM load_manifest;
+        """).fetchall()
+    }
+
+    def fingerprint(f):
+        stat = os.stat(f["path"])
+        f["size_bytes"], f["mtime_ns"] = stat.st_size, stat.st_mtime_ns
+        previous = loaded.get((f["taxi_type"], f["source_month"]))
+        if previous and previous[:3] == (f["size_bytes"], f["mtime_ns"], f["etag"]):
+            f["checksum"] = previous[3]
+            return False
+        f["checksum"] = file_checksum(f["path"])
+        return previous is None or previous[0] != f["size_bytes"] or previous[3] != f["checksum"]
+
+    # hashlib releases the GIL while hashing, so files are checksummed in parallel
+    with ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as pool:
+        flags = list(pool.map(fingerprint, files))
+    changed = [f for f, changed in zip(files, flags) if changed]
+
+    touched = [
+        f for f, changed in zip(files, flags)
+        if not changed and loaded[(f["taxi_type"], f["source_month"])][1:3] != (f["mtime_ns"], f["etag"])
+    ]
+    for f in touched:
+        con.execute("""
+            UPDATE load_manifest SET mtime_ns = ?, etag = ? WHERE taxi_type = ? AND source_month = ?;
+        """, [f["mtime_ns"], f["etag"], f["taxi_type"], f["source_month"]])
+    return changed
+
+def table_exists(con, table):
+    return con.execute("""
+        SELECT COUNT(*) FROM information_schema.tables WHERE table_name = ?;
+    """, [table]).fetchone()[0] > 0
+
+def create_trips_table(con):
+    """
+    Create the unified trips table. The first time it is created, the tables of earlier
+    versions (per taxi type, or 2024 only) are dropped and the manifest cleared so every
+    month is reloaded.
+    """
+    if table_exists(con, TRIPS_TABLE):
+        return
+    columns = ",\n            ".join(f"{name} {type_}" for name, type_ in TRIPS_COLUMNS.items())
+    con.execute(f"""
+        DROP TABLE IF EXISTS yellow_trips_2024;
+        DROP TABLE IF EXISTS green_trips_2024;
+        DROP TABLE IF EXISTS trips_2024;
+        DROP TABLE IF EXISTS trips_2024_transformed;
+        DELETE FROM load_manifest;
+
+        CREATE TABLE {TRIPS_TABLE} (
+            {columns}
+        );
+    """)
+    print(f"Created table {TRIPS_TABLE}")
+    logger.info(f"Created table {TRIPS_TABLE}")
+
+def scan_sql(taxi_type, paths):
+    """
+    One read_parquet scan over a taxi type's files, normalized to the trips columns
+    (NULL for columns the fleet doesn't have)
+    """
+    columns = [
+        f"CAST('{taxi_type}' AS {TRIPS_COLUMNS['taxi_type']}) AS taxi_type",
+        "regexp_extract(filename, '(\\d{4}-\\d{2})\\.parquet$', 1) AS source_month",
+    ] + [
+        f"CAST({source or 'NULL'} AS {TRIPS_COLUMNS[name]}) AS {name}"
+        for name, source in fleets.FLEETS[taxi_type]["columns"].items()
+    ]
+    return f"""
+        SELECT {", ".join(columns)}
+        FROM read_parquet({sql_list(paths)}, union_by_name=true, filename=true)
+    """
+
+def replace_months(con, files):
+    """
+    Replace the months of the given source files in the trips table and load_manifest,
+    in one transaction: their old rows are deleted and all files are inserted with one
+    read_parquet scan per taxi type.
+    """
+    loaded = [(f["taxi_type"], f["source_month"]) for f in files]
+    scans = " UNION ALL ".join(
+        scan_sql(taxi_type, [f["path"] for f in files if f["taxi_type"] == taxi_type])
+        for taxi_type in fleets.FLEETS
+        if any(f["taxi_type"] == taxi_type for f in files)
+    )
+
+    con.execute("BEGIN TRANSACTION;")
+    try:
         con.execute(f"""
-            CREATE TABLE vehicle_emissions AS
-            SELECT * FROM read_csv_auto('data/vehicle_emissions.csv', header=True);
-        """)
-        print("Created table vehicle_emissions from CSV")
-        logger.info("Created table vehicle_emissions from CSV")
-
-        # row count
-        count = con.execute("""
-            SELECT COUNT(*) FROM vehicle_emissions;
-        """)
-        rows = count.fetchone()[0]
-        print(f"Number of rows in vehicle_emissions: {rows:,}")
-        logger.info(f"Number of rows in vehicle_emissions: {rows:,}")
-
-        # Build 2024 monthly parquet urls
-        base = "https://d37ci6vzurychx.cloudfront.net/trip-data"
-        yellow_urls = [f"{base}/yellow_tripdata_2024-{m:02d}.parquet" for m in range(1, 13)]
-        green_urls  = [f"{base}/green_tripdata_2024-{m:02d}.parquet"  for m in range(1, 13)]
-
-        # YELLOW 2024 table
-        con.execute(f"""
-            DROP TABLE IF EXISTS yellow_trips_2024;
-            
-            CREATE TABLE yellow_trips_2024 AS
-            SELECT * FROM read_parquet('{yellow_urls[0]}');
-        """)
-        print("Created yellow_trips_2024 from January file")
-        logger.info("Created yellow_trips_2024 from January file")
-
-        # insert remaining months
-        for u in yellow_urls[1:]:
-            con.execute(f"INSERT INTO yellow_trips_2024 SELECT * FROM read_parquet('{u}');")
-        print("Inserted remaining Yellow 2024 months")
-        logger.info("Inserted remaining Yellow 2024 months")
-
-        y_count = con.execute("""
-            SELECT COUNT(*) FROM yellow_trips_2024;
-        """).fetchone()[0]
-        print(f"Number of rows in yellow_trips_2024: {y_count:,}")
-        logger.info(f"Number of rows in yellow_trips_2024: {y_count:,}")
-
-        # GREEN 2024 table
-        con.execute(f"""
-            DROP TABLE IF EXISTS green_trips_2024;
-            
-            CREATE TABLE green_trips_2024 AS
-            SELECT * FROM read_parquet('{green_urls[0]}');
-        """)
-        print("Created green_trips_2024 from January file")
-        logger.info("Created green_trips_2024 from January file")
-
-        # insert remaining months
-        for u in green_urls[1:]:
-            con.execute(f"INSERT INTO green_trips_2024 SELECT * FROM read_parquet('{u}');")
-        print("Inserted remaining Green 2024 months")
-        logger.info("Inserted remaining Green 2024 months")
-
-        g_count = con.execute(f"""
-            SELECT COUNT(*) FROM green_trips_2024;
-        """).fetchone()[0]
-        print(f"Number of rows in green_trips_2024: {g_count:,}")
-        logger.info(f"Number of rows in green_trips_2024: {g_count:,}")
-
-        # descriptive stats for yellow
+            DELETE FROM {TRIPS_TABLE}
+            WHERE list_contains(?, taxi_type || '/' || source_month);
+        """, [[f"{t}/{m}" for t, m in loaded]])
+        con.execute(f"INSERT INTO {TRIPS_TABLE} {scans};")
+
+        for f in files:
+            row_count = con.execute("""
+                SELECT SUM(num_rows) FROM parquet_file_metadata(?);
+            """, [f["path"]]).fetchone()[0]
+            con.execute("""
+                INSERT OR REPLACE INTO load_manifest
+                    (taxi_type, source_month, file_name, size_bytes, mtime_ns, etag, checksum, row_count,
+                     loaded_at, cleaned_at, transformed_at, exported_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, now(), NULL, NULL, NULL);
+            """, [f["taxi_type"], f["source_month"], os.path.basename(f["path"]),
+                  f["size_bytes"], f["mtime_ns"], f["etag"], f["checksum"], row_count])
+        con.execute("COMMIT;")
+    except Exception:
+        con.execute("ROLLBACK;")
+        raise
+
+def load_trips(con, taxi_types=TAXI_TYPES):
+    """
+    Load the new or changed months of the given taxi types into the trips table:
+    - every row carries taxi_type and source_month ('YYYY-MM') so a month can be replaced on its own
+    - changed months are deleted and re-inserted with one INSERT scanning all changed files,
+      or one month file per transaction when they are too many rows for the memory budget
+    - load_manifest is updated with each file's size, modification time, checksum, etag,
+      row count and load time
+    Returns the list of (taxi_type, source_month) that were (re)loaded.
+    """
+    files = [f for taxi_type in taxi_types for year in fleets.YEARS for f in resolve_source_files(taxi_type, year)]
+    changed = changed_files(con, files)
+    if not changed:
+        print(f"{TRIPS_TABLE}: all {', '.join(taxi_types)} months already loaded, nothing to do")
+        logger.info(f"{TRIPS_TABLE}: all {', '.join(taxi_types)} months already loaded, nothing to do")
+        return []
+
+    rows = con.execute(f"""
+        SELECT SUM(num_rows) FROM parquet_file_metadata({sql_list([f["path"] for f in changed])});
+    """).fetchone()[0]
+    if resources.chunked(con, rows):
+        logger.info(f"{TRIPS_TABLE}: {rows:,} rows to load, more than the memory budget fits, loading one month file at a time")
+        for f in changed:
+            replace_months(con, [f])
+    else:
+        replace_months(con, changed)
+
+    loaded = [(f["taxi_type"], f["source_month"]) for f in changed]
+    for taxi_type in taxi_types:
+        months = [m for t, m in loaded if t == taxi_type]
+        if months:
+            print(f"{TRIPS_TABLE}: loaded {len(months)} new or changed {taxi_type} months: {', '.join(months)}")
+            logger.info(f"{TRIPS_TABLE}: loaded {len(months)} new or changed {taxi_type} months: {', '.join(months)}")
+    return loaded
+
+def load_vehicle_emissions(con):
+    """
+    (Re)load the vehicle_emissions lookup table from data/vehicle_emissions.csv, adding
+    default effective_from/effective_to dates when the CSV has none.
+    """
+    con.execute("""
+        DROP TABLE IF EXISTS vehicle_emissions;
+    """)
+    print("Dropped table if exists: vehicle_emissions")
+    logger.info("Dropped table if exists: vehicle_emissions")
+
+    con.execute("""
+        CREATE TABLE vehicle_emissions AS
+        SELECT * FROM read_csv_auto('data/vehicle_emissions.csv', header=True);
+
+        -- factors without an effective date range apply to every trip; the CSV can
+        -- add effective_from/effective_to columns to version a vehicle type's factors
+        ALTER TABLE vehicle_emissions ADD COLUMN IF NOT EXISTS effective_from DATE DEFAULT DATE '1900-01-01';
+        ALTER TABLE vehicle_emissions ADD COLUMN IF NOT EXISTS effective_to DATE DEFAULT DATE '9999-12-31';
+    """)
+    print("Created table vehicle_emissions from CSV")
+    logger.info("Created table vehicle_emissions from CSV")
+
+    # row count
+    rows = con.execute("""
+        SELECT COUNT(*) FROM vehicle_emissions;
+    """).fetchone()[0]
+    print(f"Number of rows in vehicle_emissions: {rows:,}")
+    logger.info(f"Number of rows in vehicle_emissions: {rows:,}")
+
+def load_parquet_files(con=None):
+    """
+    Load trip data from monthly parquet files into DuckDB tables:
+    - Load vehicle_emissions.csv into a DuckDB table named vehicle_emissions
+    - Load every month of the configured years and fleets (PIPELINE_YEARS, PIPELINE_FLEETS;
+      yellow and green 2024 by default) into a single DuckDB table named trips, with a
+      taxi_type column and normalized, narrowed columns
+    Each taxi type is read with a single read_parquet scan over all of its new or changed
+    monthly files; months already recorded in load_manifest with the same size and checksum
+    are skipped, changed months replace only their own rows.
+    Creates 3 tables: vehicle_emissions, trips, load_manifest
+    Returns True if loading succeeded.
+    """
+    try:
+        if con is None:
+            # Connect to local DuckDB instance
+            con = instrument.connect("load", database='emissions.duckdb', read_only=False)
+            logger.info("Connected to DuckDB instance")
+
+        load_vehicle_emissions(con)
+        create_manifest(con)
+        create_trips_table(con)
+
+        # trips of every configured year and fleet: only new or changed months are (re)loaded
+        load_trips(con)
+
+        counts = con.execute(f"""
+            SELECT taxi_type, COUNT(*) FROM {TRIPS_TABLE} GROUP BY taxi_type ORDER BY taxi_type;
+        """).fetchall()
+        for taxi_type, count in counts:
+            print(f"Number of {taxi_type} rows in {TRIPS_TABLE}: {count:,}")
+            logger.info(f"Number of {taxi_type} rows in {TRIPS_TABLE}: {count:,}")
+
+        # descriptive stats per fleet
         stats = con.execute(f"""
             SELECT
-                MIN(tpep_pickup_datetime) AS first_pickup,
-                MAX(tpep_dropoff_datetime) AS last_dropoff,
-                AVG(trip_distance) AS avg_distance,
-                MIN(trip_distance) AS min_distance,
-                MAX(trip_distance) AS max_distance,
-            FROM yellow_trips_2024;
-        """).fetchone()
-        print(f"\nYellow Trips 2024 Descriptive Stats - "
-              f"first pickup: {stats[0]}, last dropoff: {stats[1]}, "
-              f"average distance: {stats[2]:.2f}, min distance: {stats[3]}, max distance: {stats[4]}")
-        logger.info(f"Yellow Trips 2024 Descriptive Stats: {stats}")
-
-        # descriptive stats for green
-        stats = con.execute(f"""
-            SELECT 
-                MIN(lpep_pickup_datetime) AS first_pickup,
-                MAX(lpep_dropoff_datetime) AS last_dropoff,
+                taxi_type,
+                MIN(pickup_datetime) AS first_pickup,
+                MAX(dropoff_datetime) AS last_dropoff,
                 AVG(trip_distance) AS avg_distance,
                 MIN(trip_distance) AS min_distance,
                 MAX(trip_distance) AS max_distance
-            FROM green_trips_2024;
-        """).fetchone()
-        print(f"Green trips — first pickup: {stats[0]}, last dropoff: {stats[1]}, "
-            f"avg_distance: {stats[2]:.2f}, min_distance: {stats[3]}, max_distance: {stats[4]}")
-        logger.info(f"Green trips stats: {stats}")
+            FROM {TRIPS_TABLE}
+            GROUP BY taxi_type ORDER BY taxi_type;
+        """).fetchall()
+        for row in stats:
+            print(f"\n{row[0].capitalize()} Trips Descriptive Stats - "
+                  f"first pickup: {row[1]}, last dropoff: {row[2]}, "
+                  f"average distance: {row[3]:.2f}, min distance: {row[4]}, max distance: {row[5]}")
+            logger.info(f"{row[0].capitalize()} Trips Descriptive Stats: {row[1:]}")
+        return True
 
     except Exception as e:
         print(f"An error occurred: {e}")
         logger.error(f"An error occurred: {e}")
+        return False
 
 if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s',
+        filename='logs/load.log'
+    )
     load_parquet_files()
     print("Data loading complete.")
     logger.info("Data loading complete.")
\ No newline at end of file
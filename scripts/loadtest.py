@@ -0,0 +1,114 @@
+"""
+Load test for serve.py: concurrent clients send a mix of /co2 queries over keep-alive
+connections for a fixed time, then throughput and latency percentiles are reported.
+The queries cover the fleets and years configured for the service (PIPELINE_FLEETS,
+PIPELINE_YEARS; see fleets.py).
+
+Start the service, then from the repository root:
+    python scripts/loadtest.py [--url http://127.0.0.1:8022] [--clients 8] [--seconds 10]
+"""
+import argparse
+import datetime
+import http.client
+import json
+import random
+import threading
+import time
+from urllib.parse import urlencode, urlparse
+
+import fleets
+
+GRAINS = ["hour", "dow", "week", "month", "total"]
+
+def random_query(rng, taxi_types=fleets.TAXI_TYPES, years=fleets.YEARS):
+    """
+    A /co2 path with a random grain, taxi types (all of them or one) and (usually) date
+    range in one of the years
+    """
+    params = [("grain", rng.choice(GRAINS))]
+    params += [("taxi_type", t) for t in rng.choice([taxi_types] + [[t] for t in taxi_types])]
+    if rng.random() < 0.8:
+        start = datetime.date(rng.choice(years), 1, 1) + datetime.timedelta(days=rng.randrange(365))
+        end = start + datetime.timedelta(days=rng.randrange(1, 120))
+        params += [("start", start.isoformat()), ("end", end.isoformat())]
+    return "/co2?" + urlencode(params)
+
+def client(url, deadline, seed, latencies, errors):
+    """Send queries on one connection until the deadline, appending latencies in seconds"""
+    rng = random.Random(seed)
+    conn = http.client.HTTPConnection(url.hostname, url.port, timeout=30)
+    while time.perf_counter() < deadline:
+        path = random_query(rng)
+        start = time.perf_counter()
+        try:
+            conn.request("GET", path)
+            response = conn.getresponse()
+            body = response.read()
+            if response.status != 200:
+                errors.append(f"{response.status} {body[:200]!r}")
+                continue
+        except (OSError, http.client.HTTPException) as e:
+            errors.append(str(e))
+            conn.close()
+            conn = http.client.HTTPConnection(url.hostname, url.port, timeout=30)
+            continue
+        latencies.append(time.perf_counter() - start)
+    conn.close()
+
+def percentile(values, p):
+    """Nearest-rank percentile of sorted values"""
+    if not values:
+        return None
+    return values[min(len(values) - 1, max(0, round(p / 100 * len(values)) - 1))]
+
+def load_test(url, clients=8, seconds=10.0, seed=42):
+    """Run the load test, returning requests, errors, throughput and latency percentiles (ms)"""
+    parsed = urlparse(url)
+    latencies, errors = [], []
+    deadline = time.perf_counter() + seconds
+    threads = [
+        threading.Thread(target=client, args=(parsed, deadline, seed + i, latencies, errors))
+        for i in range(clients)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "clients": clients,
+        "seconds": round(elapsed, 3),
+        "requests": len(latencies),
+        "errors": len(errors),
+        "first_errors": errors[:5],
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        **{
+            f"p{p}_ms": round(percentile(latencies, p) * 1000, 3) if latencies else None
+            for p in (50, 95, 99)
+        },
+        "max_ms": round(latencies[-1] * 1000, 3) if latencies else None,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the CO2 query service")
+    parser.add_argument("--url", default="http://127.0.0.1:8022")
+    parser.add_argument("--clients", type=int, default=8, help="concurrent keep-alive clients")
+    parser.add_argument("--seconds", type=float, default=10.0, help="how long to send queries")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="also write the results as JSON to this file")
+    args = parser.parse_args()
+
+    results = load_test(args.url, args.clients, args.seconds, args.seed)
+    print(f"{results['requests']} requests in {results['seconds']}s from {results['clients']} clients, "
+          f"{results['errors']} errors")
+    print(f"throughput {results['throughput_rps']} req/s")
+    print(f"latency p50 {results['p50_ms']} ms, p95 {results['p95_ms']} ms, "
+          f"p99 {results['p99_ms']} ms, max {results['max_ms']} ms")
+    for error in results["first_errors"]:
+        print(f"error: {error}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
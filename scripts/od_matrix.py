@@ -0,0 +1,206 @@
+"""
+Origin-destination CO2 matrix: CO2, trips and miles for every pickup zone x dropoff zone
+pair, per taxi type and month, as one dense NumPy array
+
+    od[metric, taxi, month, pu_location_id, do_location_id]
+    metric: METRICS (co2_kg, trips, miles)
+    taxi: TAXI_TYPES, month: MONTHS, every month of the configured years (the source file month)
+    location ids index the zone axes directly (TLC zones are 1-265; 0 is unused)
+
+The metric comes first so one metric of a month is a contiguous 266 x 266 block.
+
+persisted as a memory-mapped .npy file next to the database (emissions_od.npy, with its
+build state in emissions_od.json). Building it is the only time the trips are scanned:
+zone pair questions are answered from the array with ODMatrix.
+
+Run from the repository root after the transform (the pipeline runs it as od_matrix):
+    python scripts/od_matrix.py [--top 10]
+"""
+import argparse
+import json
+import logging
+import os
+
+import numpy as np
+
+import fleets
+import instrument
+
+logger = logging.getLogger(__name__)
+
+TRANSFORMED = "trips_transformed"
+TAXI_TYPES = fleets.TAXI_TYPES
+MONTHS = [f"{year}-{month:02d}" for year in fleets.YEARS for month in range(1, 13)]
+METRICS = ["co2_kg", "trips", "miles"]
+ZONES = 266
+
+# Matrix file and its build state (override with OD_MATRIX_PATH)
+OD_PATH = os.environ.get("OD_MATRIX_PATH", "emissions_od.npy")
+STATE_PATH = os.path.splitext(OD_PATH)[0] + ".json"
+
+SHAPE = (len(METRICS), len(TAXI_TYPES), len(MONTHS), ZONES, ZONES)
+
+def read_state():
+    """
+    {'taxi_type/YYYY-MM': transformed_at} of the months in the matrix file; empty when
+    there is none or it was built for other fleets or years
+    """
+    if not os.path.exists(OD_PATH) or not os.path.exists(STATE_PATH):
+        return {}
+    with open(STATE_PATH) as f:
+        state = json.load(f)
+    if state.get("taxi_types") != TAXI_TYPES or state.get("months") != MONTHS:
+        return {}
+    return state["built"]
+
+def pending_months(con, state):
+    """
+    Transformed months whose transformed_at differs from the one the matrix was built
+    from, as {'taxi_type/YYYY-MM': transformed_at}
+    """
+    rows = con.execute("""
+        SELECT taxi_type || '/' || source_month, CAST(transformed_at AS VARCHAR)
+        FROM load_manifest
+        WHERE transformed_at IS NOT NULL AND list_contains(?, taxi_type) AND list_contains(?, source_month);
+    """, [TAXI_TYPES, MONTHS]).fetchall()
+    return {month: transformed_at for month, transformed_at in rows if state.get(month) != transformed_at}
+
+def fill_months(con, od, months):
+    """
+    Zero the given 'taxi_type/YYYY-MM' months of od and fill them from one GROUP BY over
+    the transformed trips. Trips without a zone id or with one outside 0-265 are left out
+    (the latter logged).
+    """
+    for month in months:
+        taxi_type, source_month = month.split("/")
+        od[:, TAXI_TYPES.index(taxi_type), MONTHS.index(source_month)] = 0
+
+    cols = con.execute(f"""
+        SELECT
+            list_position(?, CAST(taxi_type AS VARCHAR)) - 1 AS taxi,
+            list_position(?, source_month) - 1 AS month,
+            pu_location_id AS pu_zone,
+            do_location_id AS do_zone,
+            SUM(trip_co2_kgs) AS co2_kg,
+            COUNT(*) AS trips,
+            SUM(trip_distance) AS miles
+        FROM {TRANSFORMED}
+        WHERE list_contains(?, CAST(taxi_type AS VARCHAR) || '/' || source_month)
+            AND pu_location_id IS NOT NULL AND do_location_id IS NOT NULL
+        GROUP BY ALL;
+    """, [TAXI_TYPES, MONTHS, list(months)]).fetchnumpy()
+
+    pu_zone = np.asarray(cols["pu_zone"])
+    do_zone = np.asarray(cols["do_zone"])
+    valid = (pu_zone >= 0) & (pu_zone < ZONES) & (do_zone >= 0) & (do_zone < ZONES)
+    if not valid.all():
+        logger.warning(f"Left out {int(np.asarray(cols['trips'])[~valid].sum())} trips with an unknown zone id")
+
+    index = (np.asarray(cols["taxi"])[valid], np.asarray(cols["month"])[valid], pu_zone[valid], do_zone[valid])
+    od[(slice(None),) + index] = np.stack([np.asarray(cols[metric], dtype=np.float64)[valid] for metric in METRICS])
+
+def build_od_matrix(con=None):
+    """
+    Create or update the OD matrix file: only months transformed since the matrix last
+    saw them are rebuilt, in place in the memory map. The build state is written after
+    the array is flushed, so an interrupted build is redone next time.
+    Returns True if it succeeded.
+    """
+    try:
+        if con is None:
+            # Connect to local DuckDB instance
+            con = instrument.connect("od_matrix", database='emissions.duckdb', read_only=True)
+            logger.info("Connected to DuckDB instance")
+
+        state = read_state()
+        months = pending_months(con, state)
+        if not months:
+            print("OD matrix is up to date")
+            logger.info("OD matrix is up to date")
+            return True
+
+        if state:
+            od = np.load(OD_PATH, mmap_mode="r+")
+        else:
+            od = np.lib.format.open_memmap(OD_PATH, mode="w+", dtype=np.float64, shape=SHAPE)
+        fill_months(con, od, months)
+        od.flush()
+        del od
+
+        state.update(months)
+        with open(STATE_PATH, "w") as f:
+            json.dump({"taxi_types": TAXI_TYPES, "months": MONTHS, "built": state}, f, indent=2, sort_keys=True)
+        print(f"Built OD matrix for {len(months)} months in {OD_PATH}")
+        logger.info(f"Built OD matrix for {len(months)} months in {OD_PATH}")
+        return True
+
+    except Exception as e:
+        print(f"An error occurred: {e}")
+        logger.error(f"An error occurred: {e}")
+        return False
+
+class ODMatrix:
+    """
+    Read-only view of the OD matrix file. Queries select taxi types and months (default:
+    all), sum over them and return plain arrays or lists, never reading the trip tables.
+    """
+
+    def __init__(self, path=OD_PATH):
+        self.od = np.load(path, mmap_mode="r")
+
+    def _select(self, metric, taxi_types=None, months=None):
+        """(taxi, month, pu, do) array of metric for the given taxi types and 'YYYY-MM' months"""
+        od = self.od[METRICS.index(metric)]
+        if taxi_types:
+            od = od[[TAXI_TYPES.index(t) for t in taxi_types]]
+        if months:
+            od = od[:, [MONTHS.index(m) for m in months]]
+        return od
+
+    def matrix(self, metric="co2_kg", taxi_types=None, months=None):
+        """ZONES x ZONES array of metric from each pickup zone (rows) to each dropoff zone (columns)"""
+        return self._select(metric, taxi_types, months).sum(axis=(0, 1))
+
+    def by_month(self, metric="co2_kg", taxi_types=None):
+        """{month: ZONES x ZONES array of metric}"""
+        od = self._select(metric, taxi_types).sum(axis=0)
+        return dict(zip(MONTHS, od))
+
+    def from_zone(self, zone, metric="co2_kg", taxi_types=None, months=None):
+        """metric from pickup zone to every dropoff zone"""
+        return self._select(metric, taxi_types, months)[:, :, zone, :].sum(axis=(0, 1))
+
+    def to_zone(self, zone, metric="co2_kg", taxi_types=None, months=None):
+        """metric to dropoff zone from every pickup zone"""
+        return self._select(metric, taxi_types, months)[:, :, :, zone].sum(axis=(0, 1))
+
+    def zone_totals(self, metric="co2_kg", taxi_types=None, months=None, by="pickup"):
+        """metric per pickup (or dropoff) zone"""
+        return self.matrix(metric, taxi_types, months).sum(axis=1 if by == "pickup" else 0)
+
+    def top_pairs(self, k=10, metric="co2_kg", taxi_types=None, months=None):
+        """The k (pu_location_id, do_location_id, value) pairs with the largest metric"""
+        matrix = self.matrix(metric, taxi_types, months)
+        flat = matrix.ravel()
+        k = min(k, flat.size)
+        top = np.argpartition(flat, -k)[-k:]
+        top = top[np.argsort(flat[top])[::-1]]
+        return [(int(i // ZONES), int(i % ZONES), float(flat[i])) for i in top if flat[i] > 0]
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s',
+        filename='logs/od_matrix.log'
+    )
+    parser = argparse.ArgumentParser(description="Build the OD CO2 matrix and show the top zone pairs")
+    parser.add_argument("--top", type=int, default=10, help="number of zone pairs to show")
+    args = parser.parse_args()
+
+    if build_od_matrix():
+        od = ODMatrix()
+        for taxi_type in TAXI_TYPES:
+            print(f"Top {args.top} {taxi_type.upper()} zone pairs by CO2 (kg):")
+            for pu_zone, do_zone, co2_kg in od.top_pairs(args.top, taxi_types=[taxi_type]):
+                print(f"  {pu_zone:>3} -> {do_zone:>3}: {co2_kg:,.1f}")
+    print("OD matrix complete.")
+    logger.info("OD matrix complete.")
@@ -0,0 +1,197 @@
+"""
+Process-parallel load and clean: one worker process per (fleet, month) partition, then
+one merge into the database.
+
+Each worker loads one new or changed month file into a private in-memory DuckDB, cleans
+it with the rules and dedup mode of clean.py and writes the cleaned rows to a staged
+parquet file (STAGING_DIR/<fleet>/<YYYY-MM>.parquet). The merge then replaces those
+months in the trips table with one read_parquet scan over the staged files, and records
+them in cleaning_report and load_manifest as loaded and cleaned, ready for the dbt
+transform.
+
+emissions.duckdb can only have one writer, so only the merge touches it; the workers
+never open it. Run from the repository root (the pipeline uses it instead of its load_*
+and clean_* stages when PARTITION_PROCESSES is above 1):
+    python scripts/partitions.py [--processes 8]
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
+import duckdb
+
+import clean
+import fleets
+import instrument
+import load
+import resources
+
+logger = logging.getLogger(__name__)
+
+# Worker processes (override with PARTITION_PROCESSES; default one per core). They share
+# the memory limit of the main connection and run DuckDB single threaded each.
+PROCESSES = int(os.environ.get("PARTITION_PROCESSES", str(os.cpu_count() or 1)))
+
+# Where workers write their cleaned partitions until the merge (override with PARTITION_STAGING_DIR)
+STAGING_DIR = os.environ.get("PARTITION_STAGING_DIR", "data/staging")
+
+def configure_logging():
+    """Log to logs/partitions.log, in the script and in its worker processes"""
+    logging.basicConfig(
+        level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s',
+        filename='logs/partitions.log'
+    )
+
+def staged_path(taxi_type, source_month):
+    """Staged parquet file of one cleaned partition"""
+    return os.path.join(STAGING_DIR, taxi_type, f"{source_month}.parquet")
+
+def process_partition(job):
+    """
+    Worker: load and clean one source month file in an in-memory DuckDB and write the
+    cleaned rows to its staged file. Returns the job with the partition's raw row count
+    and its cleaning_report row.
+    """
+    taxi_type, month = job["taxi_type"], job["source_month"]
+    temp_directory = os.path.join(STAGING_DIR, f".tmp-{taxi_type}-{month}")
+    con = duckdb.connect()
+    con.execute(f"""
+        SET memory_limit = '{job["memory_limit"]}';
+        SET threads = 1;
+        SET preserve_insertion_order = false;
+        SET temp_directory = '{temp_directory}';
+    """)
+
+    con.execute(f"CREATE TABLE {clean.TRIPS_TABLE} AS {load.scan_sql(taxi_type, [job['path']])};")
+    con.execute(f"CREATE TABLE batch AS {clean.batch_sql(clean.DEDUP_MODE)};", [month, [taxi_type]])
+
+    path = staged_path(taxi_type, month)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    con.execute(f"""
+        COPY (
+            SELECT * EXCLUDE (copies, reject_rule) FROM batch
+            WHERE reject_rule IS NULL
+        ) TO '{path}' (FORMAT parquet, COMPRESSION zstd);
+    """)
+    report = con.execute(f"{clean.report_sql('batch')};", [month, [taxi_type]]).fetchone()
+    con.close()
+    shutil.rmtree(temp_directory, ignore_errors=True)
+
+    # cleaning_report columns: taxi_type, source_month, rows_in, ..., rows_out, cleaned_at
+    rows_in, rows_out = report[2], report[-2]
+    logger.info(f"Staged {taxi_type} {month}: {rows_in:,} rows in, {rows_out:,} rows out")
+    return {**job, "row_count": rows_in, "rows_out": rows_out, "report": report, "staged_path": path}
+
+def merge_partitions(con, results):
+    """
+    Replace the months of the staged partitions in the trips table, cleaning_report and
+    load_manifest in one transaction, inserting every staged file with one read_parquet
+    scan. Months that were reloaded also need transforming and exporting again.
+    """
+    merged = [f"{r['taxi_type']}/{r['source_month']}" for r in results]
+    con.execute("BEGIN TRANSACTION;")
+    try:
+        con.execute(f"""
+            DELETE FROM {load.TRIPS_TABLE}
+            WHERE list_contains(?, taxi_type || '/' || source_month);
+        """, [merged])
+        con.execute(f"""
+            INSERT INTO {load.TRIPS_TABLE}
+            SELECT * FROM read_parquet({load.sql_list([r["staged_path"] for r in results])});
+        """)
+        for r in results:
+            con.execute("""
+                INSERT OR REPLACE INTO cleaning_report VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?);
+            """, list(r["report"]))
+            con.execute("""
+                INSERT OR REPLACE INTO load_manifest
+                    (taxi_type, source_month, file_name, size_bytes, mtime_ns, etag, checksum, row_count,
+                     loaded_at, cleaned_at, transformed_at, exported_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, now(), now(), NULL, NULL);
+            """, [r["taxi_type"], r["source_month"], os.path.basename(r["path"]),
+                  r["size_bytes"], r["mtime_ns"], r["etag"], r["checksum"], r["row_count"]])
+        con.execute("COMMIT;")
+    except Exception:
+        con.execute("ROLLBACK;")
+        raise
+
+def run_partitions(con, taxi_types=fleets.TAXI_TYPES, processes=PROCESSES):
+    """
+    Load and clean the new or changed months of the given fleets in every configured
+    year with a pool of worker processes, then merge them: in one transaction, or one
+    partition per transaction when they are too many rows for the memory budget.
+    Returns the list of (taxi_type, source_month) that were (re)loaded.
+    """
+    files = [f for taxi_type in taxi_types for year in fleets.YEARS for f in load.resolve_source_files(taxi_type, year)]
+    changed = load.changed_files(con, files)
+    if not changed:
+        print(f"{load.TRIPS_TABLE}: all {', '.join(taxi_types)} months already loaded, nothing to do")
+        logger.info(f"{load.TRIPS_TABLE}: all {', '.join(taxi_types)} months already loaded, nothing to do")
+        return []
+
+    processes = max(1, min(processes, len(changed)))
+    memory_limit = f"{resources.memory_budget(con) // processes // 2**20}MiB"
+    print(f"Loading and cleaning {len(changed)} partitions with {processes} worker processes ({memory_limit} each)")
+    logger.info(f"Loading and cleaning {len(changed)} partitions with {processes} worker processes ({memory_limit} each)")
+
+    # spawned, not forked: this process may hold DuckDB threads and the pipeline's threads
+    jobs = [{**f, "memory_limit": memory_limit} for f in changed]
+    with ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=configure_logging) as pool:
+        results = list(pool.map(process_partition, jobs))
+
+    rows = sum(r["rows_out"] for r in results)
+    if resources.chunked(con, rows):
+        logger.info(f"{load.TRIPS_TABLE}: {rows:,} cleaned rows to merge, merging one partition at a time")
+        for r in results:
+            merge_partitions(con, [r])
+    else:
+        merge_partitions(con, results)
+
+    for r in results:
+        os.remove(r["staged_path"])
+    for taxi_type in {r["taxi_type"] for r in results}:
+        shutil.rmtree(os.path.join(STAGING_DIR, taxi_type), ignore_errors=True)
+    loaded = [(r["taxi_type"], r["source_month"]) for r in results]
+    print(f"{load.TRIPS_TABLE}: merged {len(loaded)} new or changed months: "
+          f"{', '.join(f'{t}/{m}' for t, m in loaded)}")
+    logger.info(f"{load.TRIPS_TABLE}: merged {len(loaded)} new or changed months: "
+                f"{', '.join(f'{t}/{m}' for t, m in loaded)}")
+    return loaded
+
+def load_and_clean(con=None, processes=PROCESSES):
+    """
+    Load and clean the configured fleets and years with worker processes (see
+    run_partitions), then run the cleaning tests.
+    Returns True if it succeeded.
+    """
+    try:
+        if con is None:
+            # Connect to local DuckDB instance
+            con = instrument.connect("partitions", database='emissions.duckdb', read_only=False)
+            logger.info("Connected to DuckDB instance")
+
+        load.create_manifest(con)
+        load.create_trips_table(con)
+        clean.create_cleaning_report(con)
+        run_partitions(con, processes=processes)
+        clean.cleaning_tests(con)
+        return True
+
+    except Exception as e:
+        print(f"An error occurred: {e}")
+        logger.error(f"An error occurred: {e}")
+        return False
+
+if __name__ == "__main__":
+    configure_logging()
+    parser = argparse.ArgumentParser(description="Load and clean every (fleet, month) partition in parallel")
+    parser.add_argument("--processes", type=int, default=PROCESSES, help="worker processes")
+    args = parser.parse_args()
+
+    load_and_clean(processes=args.processes)
+    print("Partitioned load and clean complete.")
+    logger.info("Partitioned load and clean complete.")
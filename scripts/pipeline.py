@@ -0,0 +1,266 @@
+import argparse
+import hashlib
+import logging
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import analysis
+import clean
+import export
+import fleets
+import instrument
+import load
+import od_matrix
+import partitions
+import transform
+
+logger = logging.getLogger(__name__)
+
+# Each stage module also keeps writing its own log file (logs/load.log, ...)
+for module in (load, clean, partitions, transform, analysis, export, od_matrix):
+    handler = logging.FileHandler(f"logs/{module.__name__}.log")
+    handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+    module.logger.addHandler(handler)
+
+# Stages running at the same time, each on its own cursor of the shared connection
+WORKERS = int(os.environ.get("PIPELINE_WORKERS", "4"))
+
+def create_pipeline_runs(con):
+    """
+    pipeline_runs records every stage run of the runner: its input fingerprint, status
+    ('success', 'failed' or 'skipped') and timing. A stage is skipped when its inputs
+    have the fingerprint of its last successful run.
+    """
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS pipeline_runs (
+            run_id VARCHAR,
+            stage VARCHAR,
+            input_fingerprint VARCHAR,
+            status VARCHAR,
+            started_at TIMESTAMP,
+            seconds DOUBLE,
+            error VARCHAR
+        );
+    """)
+
+def query_fingerprint(con, query, parameters=None):
+    """md5 over every row of a query's result, in a stable order"""
+    return con.execute(f"""
+        SELECT md5(COALESCE(string_agg(CAST(r AS VARCHAR), '|' ORDER BY CAST(r AS VARCHAR)), ''))
+        FROM ({query}) AS r;
+    """, parameters).fetchone()[0]
+
+def files_fingerprint(paths):
+    """md5 over the name, size and modification time of files"""
+    digest = hashlib.md5()
+    for path in sorted(paths):
+        stat = os.stat(path)
+        digest.update(f"{path}|{stat.st_size}|{stat.st_mtime_ns}\n".encode())
+    return digest.hexdigest()
+
+def manifest_fingerprint(con, column, taxi_types=load.TAXI_TYPES):
+    """
+    Fingerprint of the trips table as one stage wrote it, from load_manifest: the months
+    of the given taxi types and when `column` (loaded_at, cleaned_at, transformed_at)
+    last changed them. DuckDB has no table version, and every write to the trips tables
+    goes through load_manifest, so it stands in for scanning the tables themselves.
+    """
+    return query_fingerprint(con, f"""
+        SELECT taxi_type, source_month, checksum, {column}
+        FROM load_manifest
+        WHERE list_contains(?, taxi_type)
+    """, [taxi_types])
+
+def dbt_fingerprint():
+    """Fingerprint of the dbt project: models, macros and configuration"""
+    paths = [os.path.join(transform.DBT_DIR, name) for name in ("dbt_project.yml", "profiles.yml")]
+    for sub in ("models", "macros"):
+        for root, _, names in os.walk(os.path.join(transform.DBT_DIR, sub)):
+            paths += [os.path.join(root, name) for name in names]
+    return files_fingerprint(paths)
+
+def succeeded(main):
+    """Stage function for a script's main function, which reports errors by returning False"""
+    def run(con):
+        if not main(con=con):
+            raise RuntimeError(f"{main.__name__} failed")
+    return run
+
+def pipeline_stages():
+    """
+    The stage DAG: for each stage, the stages it runs after, the function running it on
+    a connection and the function fingerprinting its inputs.
+    Load stages fingerprint the source files already on disk: fingerprinting never
+    downloads, so months the TLC publishes (or republishes) later are fetched by forcing
+    the load stages, e.g. --force load_yellow (or partitions).
+    Each fleet is a separate branch through load and clean, so they run side by side; with
+    PARTITION_PROCESSES above 1 one partitions stage loads and cleans every fleet's months
+    in worker processes instead.
+    """
+    stages = {
+        "emissions": {
+            "after": [],
+            "run": load.load_vehicle_emissions,
+            "inputs": lambda con: files_fingerprint(["data/vehicle_emissions.csv"]),
+        },
+    }
+    if partitions.PROCESSES > 1:
+        stages["partitions"] = {
+            "after": [],
+            "run": lambda con: (partitions.run_partitions(con), clean.cleaning_tests(con)),
+            "inputs": lambda con: files_fingerprint(
+                [path for t in load.TAXI_TYPES for path in load.local_source_files(t, fleets.YEARS)]
+            ) + f"|{load.TRIPS_TABLE}|{clean.DEDUP_MODE}|{','.join(clean.TRIP_KEY)}",
+        }
+    else:
+        for taxi_type in load.TAXI_TYPES:
+            # the source files on disk and the table they load into (a new table starts empty)
+            stages[f"load_{taxi_type}"] = {
+                "after": [],
+                "run": lambda con, t=taxi_type: load.load_trips(con, [t]),
+                "inputs": lambda con, t=taxi_type: files_fingerprint(load.local_source_files(t, fleets.YEARS))
+                    + f"|{load.TRIPS_TABLE}",
+            }
+            stages[f"clean_{taxi_type}"] = {
+                "after": [f"load_{taxi_type}"],
+                "run": lambda con, t=taxi_type: (clean.clean_trips(con, taxi_types=[t]), clean.cleaning_tests(con, [t])),
+                "inputs": lambda con, t=taxi_type: manifest_fingerprint(con, "loaded_at", [t])
+                    + f"|{clean.DEDUP_MODE}|{','.join(clean.TRIP_KEY)}",
+            }
+    stages["transform"] = {
+        "after": ["emissions"] + [name for name in stages if name == "partitions" or name.startswith("clean_")],
+        "run": succeeded(transform.transform_trips),
+        "inputs": lambda con: manifest_fingerprint(con, "cleaned_at")
+            + "|" + query_fingerprint(con, "SELECT * FROM vehicle_emissions")
+            + "|" + dbt_fingerprint(),
+    }
+    stages["od_matrix"] = {
+        "after": ["transform"],
+        "run": succeeded(od_matrix.build_od_matrix),
+        # the transformed months only (a deleted matrix file is rebuilt with --force od_matrix)
+        "inputs": lambda con: manifest_fingerprint(con, "transformed_at") + f"|{od_matrix.OD_PATH}",
+    }
+    # after od_matrix too: the report's OD heatmaps are drawn from the matrix file
+    stages["analysis"] = {
+        "after": ["transform", "od_matrix"],
+        "run": succeeded(analysis.analyze_parquet_files),
+        "inputs": lambda con: manifest_fingerprint(con, "transformed_at"),
+    }
+    stages["export"] = {
+        "after": ["transform"],
+        "run": succeeded(export.export_parquet_files),
+        "inputs": lambda con: manifest_fingerprint(con, "transformed_at") + f"|{export.EXPORT_DIR}",
+    }
+    return stages
+
+def last_fingerprint(con, stage):
+    """Input fingerprint of the stage's last successful run, if any"""
+    row = con.execute("""
+        SELECT input_fingerprint FROM pipeline_runs
+        WHERE stage = ? AND status = 'success'
+        ORDER BY started_at DESC
+        LIMIT 1;
+    """, [stage]).fetchone()
+    return row[0] if row else None
+
+def run_stage(con, run_id, name, stage, force):
+    """
+    Run one stage on its own cursor unless its inputs are unchanged since its last
+    successful run. Records the outcome in pipeline_runs and returns the status.
+    """
+    cur = con.cursor(stage=name)
+    started_at = time.time()
+    fingerprint, status, error = None, "success", None
+    try:
+        fingerprint = stage["inputs"](cur)
+        if not force and fingerprint == last_fingerprint(cur, name):
+            status = "skipped"
+            print(f"[{name}] inputs unchanged since its last successful run, skipped")
+            logger.info(f"[{name}] inputs unchanged since its last successful run, skipped")
+        else:
+            print(f"[{name}] running")
+            logger.info(f"[{name}] running")
+            stage["run"](cur)
+    except Exception as e:
+        status, error = "failed", str(e)
+        print(f"An error occurred in {name}: {e}")
+        logger.error(f"An error occurred in {name}: {e}")
+
+    seconds = time.time() - started_at
+    cur.execute("""
+        INSERT INTO pipeline_runs VALUES (?, ?, ?, ?, to_timestamp(?), ?, ?);
+    """, [run_id, name, fingerprint, status, started_at, seconds, error])
+    cur.close()
+    if status == "success":
+        print(f"[{name}] finished in {seconds:.2f}s")
+        logger.info(f"[{name}] finished in {seconds:.2f}s")
+    return status
+
+def run_pipeline(force=()):
+    """
+    Run load, clean, dbt transform, analysis, export and the OD matrix as a DAG in this process, on one
+    DuckDB connection so the catalog and buffer pool stay warm between stages:
+    - a stage starts as soon as the stages it runs after have succeeded or been skipped
+    - independent stages (the fleet branches, analysis, export, od_matrix) run
+      concurrently, each on a cursor of the shared connection
+    - a stage whose input fingerprint matches its last successful run is skipped
+    Stages named in force (or all with 'all') run regardless of their fingerprint.
+    Returns True if no stage failed.
+    """
+    con = instrument.connect("pipeline", database='emissions.duckdb', read_only=False)
+    logger.info("Connected to DuckDB instance")
+
+    # tables the branches write to concurrently are created up front, once
+    create_pipeline_runs(con)
+    load.create_manifest(con)
+    load.create_trips_table(con)
+    clean.create_cleaning_report(con)
+
+    stages = pipeline_stages()
+    status = {}
+    running = {}
+    with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+        while len(status) < len(stages):
+            for name, stage in stages.items():
+                if name in status or name in running:
+                    continue
+                upstream = [status.get(after) for after in stage["after"]]
+                if "failed" in upstream or "not run" in upstream:
+                    status[name] = "not run"
+                    print(f"[{name}] not run: an upstream stage failed")
+                    logger.warning(f"[{name}] not run: an upstream stage failed")
+                elif all(s in ("success", "skipped") for s in upstream):
+                    forced = name in force or "all" in force
+                    running[name] = pool.submit(run_stage, con, con.run_id, name, stage, forced)
+            if not running:
+                continue
+            done, _ = wait(running.values(), return_when=FIRST_COMPLETED)
+            for name, future in list(running.items()):
+                if future in done:
+                    status[name] = future.result()
+                    del running[name]
+
+    summary = ", ".join(f"{name}: {s}" for name, s in status.items())
+    print(f"Pipeline run {con.run_id}: {summary}")
+    logger.info(f"Pipeline run {con.run_id}: {summary}")
+    return all(s in ("success", "skipped") for s in status.values())
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s',
+        filename='logs/pipeline.log'
+    )
+    parser = argparse.ArgumentParser(description="Run the whole pipeline in one process")
+    parser.add_argument("--force", nargs="*", default=[],
+                        help="stages to run even if their inputs are unchanged ('all' for every stage)")
+    args = parser.parse_args()
+
+    try:
+        ok = run_pipeline(force=set(args.force))
+    except Exception as e:
+        print(f"An error occurred: {e}")
+        logger.error(f"An error occurred: {e}")
+        ok = False
+    print("Pipeline complete." if ok else "Pipeline failed.")
+    logger.info("Pipeline complete." if ok else "Pipeline failed.")
@@ -0,0 +1,127 @@
+import argparse
+import hashlib
+import logging
+import os
+import pickle
+import re
+
+logger = logging.getLogger(__name__)
+
+# Results cached in the query_cache table are evicted, least recently used first, once
+# they add up to more than QUERY_CACHE_MAX_BYTES (0 turns the cache off)
+MAX_BYTES = int(os.environ.get("QUERY_CACHE_MAX_BYTES", str(64 * 2**20)))
+
+def create_query_cache(con):
+    """
+    query_cache holds the pickled cached query results, keyed by md5 of the
+    query text, its parameters and the fingerprint of the tables it reads.
+    """
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS query_cache (
+            cache_key VARCHAR PRIMARY KEY,
+            query VARCHAR,
+            fingerprint VARCHAR,
+            result BLOB,
+            bytes BIGINT,
+            created_at TIMESTAMP,
+            last_used_at TIMESTAMP,
+            hits INTEGER
+        );
+    """)
+
+def source_fingerprint(con, tables):
+    """
+    Fingerprint of the tables a query reads: their row counts and a version of their
+    contents from load_manifest (the months' checksums, when each was loaded, cleaned
+    and transformed, and the emission factor version its trips are priced with).
+    Loading, cleaning, transforming and repricing (reprice_trip_co2) all update those;
+    exporting or re-checking unchanged source files does not. Writes to the tables that
+    bypass load_manifest are not seen.
+    """
+    counts = [con.execute(f"SELECT COUNT(*) FROM {table};").fetchone()[0] for table in sorted(tables)]
+    manifest = con.execute("""
+        -- manifests created before the dbt models recorded the factor version
+        ALTER TABLE load_manifest ADD COLUMN IF NOT EXISTS factor_version VARCHAR;
+        SELECT md5(COALESCE(string_agg(
+            concat_ws('|', taxi_type, source_month, checksum, loaded_at, cleaned_at, transformed_at, factor_version),
+            '\n' ORDER BY taxi_type, source_month
+        ), ''))
+        FROM load_manifest;
+    """).fetchone()[0]
+    return "|".join(f"{table}={count}" for table, count in zip(sorted(tables), counts)) + f"|{manifest}"
+
+def cache_key(query, parameters, fingerprint):
+    """md5 of the query text (whitespace normalized), its parameters and the source fingerprint"""
+    sql = re.sub(r"\s+", " ", query).strip()
+    return hashlib.md5(f"{sql}|{parameters!r}|{fingerprint}".encode()).hexdigest()
+
+def cached_query(con, query, tables, parameters=None, fetch="fetchall"):
+    """
+    Result of query as the fetch method returns it ('fetchall' rows, or 'fetchnumpy'
+    columns as NumPy arrays), from query_cache when the tables it reads are unchanged
+    since the result was cached, otherwise by running it and caching the result. Results
+    of the same query for older data are dropped when it is cached.
+    """
+    if MAX_BYTES <= 0:
+        return getattr(con.execute(query, parameters), fetch)()
+
+    create_query_cache(con)
+    fingerprint = source_fingerprint(con, tables)
+    key = cache_key(query, parameters, f"{fingerprint}|{fetch}")
+    row = con.execute("SELECT result FROM query_cache WHERE cache_key = ?;", [key]).fetchone()
+    if row is not None:
+        con.execute("""
+            UPDATE query_cache SET last_used_at = current_localtimestamp(), hits = hits + 1
+            WHERE cache_key = ?;
+        """, [key])
+        logger.info(f"Query cache hit {key}")
+        return pickle.loads(row[0])
+
+    rows = getattr(con.execute(query, parameters), fetch)()
+    result = pickle.dumps(rows, protocol=pickle.HIGHEST_PROTOCOL)
+    sql = re.sub(r"\s+", " ", query).strip()
+    con.execute("DELETE FROM query_cache WHERE query = ?;", [sql])
+    con.execute("""
+        INSERT INTO query_cache VALUES (?, ?, ?, ?, ?, current_localtimestamp(), current_localtimestamp(), 0);
+    """, [key, sql, fingerprint, result, len(result)])
+    logger.info(f"Query cache miss {key}, cached {len(result)} bytes")
+    evict(con)
+    return rows
+
+def evict(con, max_bytes=None):
+    """Delete the least recently used results until the cache holds at most max_bytes"""
+    max_bytes = MAX_BYTES if max_bytes is None else max_bytes
+    evicted = con.execute("""
+        DELETE FROM query_cache
+        WHERE cache_key IN (
+            SELECT cache_key FROM (
+                SELECT cache_key, SUM(bytes) OVER (ORDER BY last_used_at DESC, cache_key) AS cumulative_bytes
+                FROM query_cache
+            )
+            WHERE cumulative_bytes > ?
+        )
+        RETURNING cache_key;
+    """, [max_bytes]).fetchall()
+    if evicted:
+        logger.info(f"Evicted {len(evicted)} results from the query cache")
+    return len(evicted)
+
+def cache_summary(con):
+    """(results, bytes, hits) in query_cache"""
+    create_query_cache(con)
+    return con.execute("SELECT COUNT(*), COALESCE(SUM(bytes), 0), COALESCE(SUM(hits), 0) FROM query_cache;").fetchone()
+
+if __name__ == "__main__":
+    import duckdb
+
+    parser = argparse.ArgumentParser(description="Show or clear the analysis query cache")
+    parser.add_argument("--clear", action="store_true", help="delete every cached result")
+    args = parser.parse_args()
+
+    con = duckdb.connect(database='emissions.duckdb', read_only=False)
+    if args.clear:
+        create_query_cache(con)
+        con.execute("DELETE FROM query_cache;")
+        print("Query cache cleared")
+    results, size, hits = cache_summary(con)
+    print(f"Query cache: {results} results, {size / 2**20:.2f} MB, {hits} hits")
@@ -0,0 +1,62 @@
+import logging
+import os
+import re
+
+logger = logging.getLogger(__name__)
+
+# Resource profile applied to every DuckDB connection (override with environment variables)
+# - DUCKDB_MEMORY_LIMIT: e.g. '3GB'; beyond it DuckDB spills to the temp directory (default: 80% of RAM)
+# - DUCKDB_THREADS: worker threads (default: one per core)
+# - DUCKDB_TEMP_DIRECTORY: where spilled data is written (default: emissions.duckdb.tmp)
+# - DUCKDB_PRESERVE_INSERTION_ORDER: 'false' lets inserts and COPY stream without holding
+#   rows back to keep their order (queries with ORDER BY are still ordered)
+# dbt reads the same variables (macros/resource_profile.sql)
+SETTINGS = {
+    "memory_limit": os.environ.get("DUCKDB_MEMORY_LIMIT"),
+    "threads": os.environ.get("DUCKDB_THREADS"),
+    "temp_directory": os.environ.get("DUCKDB_TEMP_DIRECTORY"),
+    "preserve_insertion_order": os.environ.get("DUCKDB_PRESERVE_INSERTION_ORDER"),
+}
+
+# Load, clean and transform work one month (and taxi type) at a time instead of all
+# pending months in one statement when those rows would need more than CHUNK_MEMORY_SHARE
+# of the memory limit, at about BYTES_PER_ROW each (a trips row plus its hash table entry
+# while it is deduplicated)
+CHUNK_MEMORY_SHARE = float(os.environ.get("CHUNK_MEMORY_SHARE", "0.5"))
+BYTES_PER_ROW = 200
+
+UNITS = {
+    "": 1, "b": 1, "bytes": 1,
+    "kb": 1000, "mb": 1000**2, "gb": 1000**3, "tb": 1000**4,
+    "kib": 1024, "mib": 1024**2, "gib": 1024**3, "tib": 1024**4,
+}
+
+def parse_size(size):
+    """Bytes in a DuckDB style size such as '4GB', '2.5 GiB' or '512MB'"""
+    match = re.fullmatch(r"\s*([\d.]+)\s*([a-zA-Z]*)\s*", size)
+    if not match or match.group(2).lower() not in UNITS:
+        raise ValueError(f"Invalid size: {size}")
+    return int(float(match.group(1)) * UNITS[match.group(2).lower()])
+
+def apply_resource_profile(con):
+    """SET every configured resource setting on con (they apply to the whole database instance)"""
+    for name, value in SETTINGS.items():
+        if value:
+            con.execute(f"SET {name} = '{value}';")
+    logger.info(f"Resource profile: {resource_summary(con)}")
+
+def resource_summary(con):
+    """The resource settings in effect on con, as {name: value}"""
+    names = list(SETTINGS)
+    values = con.execute(
+        "SELECT " + ", ".join(f"current_setting('{name}')" for name in names) + ";"
+    ).fetchone()
+    return dict(zip(names, values))
+
+def memory_budget(con):
+    """DuckDB's memory limit on con in bytes"""
+    return parse_size(con.execute("SELECT current_setting('memory_limit');").fetchone()[0])
+
+def chunked(con, rows):
+    """True if rows pending for a heavy stage are too many for the memory budget in one go"""
+    return (rows or 0) * BYTES_PER_ROW > memory_budget(con) * CHUNK_MEMORY_SHARE
@@ -0,0 +1,185 @@
+"""
+Local HTTP/JSON service answering CO2 queries from the co2_cube_hourly table (built by
+dbt, see transform.py), so answers come from ~17.5k pre-aggregated rows, not the trips.
+
+Run from the repository root after the pipeline:
+    python scripts/serve.py [--port 8022]
+
+GET /co2?grain=hour&taxi_type=yellow&start=2024-03-01&end=2024-03-31
+    grain: hour, dow, week, month or total (default total)
+    taxi_type: a configured fleet (yellow, green, ...), repeatable (default all)
+    start, end: pickup date range, inclusive (default all dates)
+returns {"query": {...}, "rows": [{"taxi_type", "period", "trips", "total_miles",
+    "total_kg", "avg_kg", "max_kg"}, ...]}
+GET /health
+returns {"status": "ok", "cube_rows": n}
+
+emissions.duckdb is opened read only, so the service never takes the write lock (DuckDB
+still won't let it open while another process has the database open read-write).
+"""
+import argparse
+import datetime
+import functools
+import json
+import logging
+import os
+import queue
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import duckdb
+
+import fleets
+import resources
+
+logging.basicConfig(
+    level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s',
+    filename='logs/serve.log'
+)
+logger = logging.getLogger(__name__)
+
+CUBE = "co2_cube_hourly"
+
+# Cursors of the read-only connection handed out to requests; a request waits for a free
+# one when all are busy (override with SERVE_POOL_SIZE)
+POOL_SIZE = int(os.environ.get("SERVE_POOL_SIZE", "8"))
+
+# Answers kept in memory for repeated queries (override with SERVE_CACHE_SIZE). No other
+# process can write emissions.duckdb while the service has it open, so they never go stale.
+CACHE_SIZE = int(os.environ.get("SERVE_CACHE_SIZE", "1024"))
+
+# Cube column each grain groups on (total: one row per taxi type)
+GRAINS = {
+    "hour": "hour_of_day",
+    "dow": "day_of_week",
+    "week": "week_of_year",
+    "month": "month_of_year",
+    "total": "NULL",
+}
+TAXI_TYPES = fleets.TAXI_TYPES
+
+class CursorPool:
+    """Fixed set of cursors on one connection, checked out one request at a time"""
+
+    def __init__(self, con, size):
+        self._cursors = queue.Queue()
+        for _ in range(size):
+            self._cursors.put(con.cursor())
+
+    def query(self, sql, parameters=None):
+        cur = self._cursors.get()
+        try:
+            return cur.execute(sql, parameters).fetchall()
+        finally:
+            self._cursors.put(cur)
+
+def parse_request(params):
+    """(grain, taxi_types, start, end) from query string parameters; ValueError if invalid"""
+    grain = params.get("grain", ["total"])[-1]
+    if grain not in GRAINS:
+        raise ValueError(f"grain must be one of {', '.join(GRAINS)}")
+    taxi_types = tuple(sorted(set(params.get("taxi_type", TAXI_TYPES))))
+    unknown = set(taxi_types) - set(TAXI_TYPES)
+    if unknown:
+        raise ValueError(f"Unknown taxi_type: {', '.join(sorted(unknown))}")
+    start = datetime.date.fromisoformat(params["start"][-1]) if "start" in params else datetime.date.min
+    end = datetime.date.fromisoformat(params["end"][-1]) if "end" in params else datetime.date.max
+    return grain, taxi_types, start, end
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def co2_query(pool, grain, taxi_types, start, end):
+    """CO2 rows per taxi type and period of grain, for pickups between start and end"""
+    rows = pool.query(f"""
+        SELECT
+            taxi_type,
+            {GRAINS[grain]} AS period,
+            SUM(trips) AS trips,
+            SUM(total_miles) AS total_miles,
+            SUM(total_kg) AS total_kg,
+            SUM(total_kg) / SUM(trips) AS avg_kg,
+            MAX(max_kg) AS max_kg
+        FROM {CUBE}
+        WHERE list_contains(?, taxi_type) AND pickup_date BETWEEN ? AND ?
+        GROUP BY ALL
+        ORDER BY taxi_type, period;
+    """, [list(taxi_types), start, end])
+    columns = ["taxi_type", "period", "trips", "total_miles", "total_kg", "avg_kg", "max_kg"]
+    return [dict(zip(columns, row)) for row in rows]
+
+class Handler(BaseHTTPRequestHandler):
+    # keep-alive, so clients can reuse one connection for many requests
+    protocol_version = "HTTP/1.1"
+    # headers and body go out in separate writes; with Nagle on, the body waits for the
+    # client's delayed ACK (~40 ms)
+    disable_nagle_algorithm = True
+    pool = None
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        try:
+            if url.path == "/co2":
+                grain, taxi_types, start, end = parse_request(parse_qs(url.query))
+                rows = co2_query(self.pool, grain, taxi_types, start, end)
+                query = {
+                    "grain": grain, "taxi_type": list(taxi_types),
+                    "start": None if start == datetime.date.min else start.isoformat(),
+                    "end": None if end == datetime.date.max else end.isoformat(),
+                }
+                self.send_json(200, {"query": query, "rows": rows})
+            elif url.path == "/health":
+                cube_rows = self.pool.query(f"SELECT COUNT(*) FROM {CUBE};")[0][0]
+                self.send_json(200, {"status": "ok", "cube_rows": cube_rows})
+            else:
+                self.send_json(404, {"error": f"Unknown path: {url.path}"})
+        except ValueError as e:
+            self.send_json(400, {"error": str(e)})
+        except Exception as e:
+            logger.error(f"An error occurred serving {self.path}: {e}")
+            self.send_json(500, {"error": str(e)})
+
+    def send_json(self, status, body):
+        data = json.dumps(body, default=float).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        # per request access log only at debug level, writing it costs more than the query
+        logger.debug(format % args)
+
+def serve(host="127.0.0.1", port=8022, database='emissions.duckdb'):
+    """Serve CO2 queries from the cube on host:port until interrupted"""
+    con = duckdb.connect(database=database, read_only=True)
+    resources.apply_resource_profile(con)
+    Handler.pool = CursorPool(con, POOL_SIZE)
+    # read the cube once up front so the first request doesn't pay for loading it
+    co2_query(Handler.pool, "hour", tuple(TAXI_TYPES), datetime.date.min, datetime.date.max)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    print(f"Serving CO2 queries on http://{host}:{port}/co2 ({POOL_SIZE} cursors)")
+    logger.info(f"Serving CO2 queries on http://{host}:{port}/co2 ({POOL_SIZE} cursors)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        con.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve CO2 queries from co2_cube_hourly over HTTP/JSON")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8022)
+    parser.add_argument("--database", default="emissions.duckdb")
+    args = parser.parse_args()
+
+    try:
+        serve(args.host, args.port, args.database)
+    except Exception as e:
+        print(f"An error occurred: {e}")
+        logger.error(f"An error occurred: {e}")
+    print("Server stopped.")
+    logger.info("Server stopped.")
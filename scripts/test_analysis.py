@@ -0,0 +1,45 @@
+import numpy as np
+
+import analysis
+
+def test_t_quantile_matches_student_t_tables():
+    # two-sided 95% critical values for 1, 2, 3, 5, 10 and 30 degrees of freedom
+    expected = [12.706, 4.303, 3.182, 2.571, 2.228, 2.042]
+    assert np.allclose(analysis.t_quantile(0.95, [1, 2, 3, 5, 10, 30]), expected, atol=0.005)
+    assert np.isnan(analysis.t_quantile(0.95, [0]))[0]
+
+def test_approx_intervals_cover_the_exact_averages(con):
+    # trips whose CO2 drifts along the table, so sampled vectors are clusters of similar trips
+    con.execute(f"""
+        SELECT setseed(0.42);
+        CREATE TABLE {analysis.TRANSFORMED} AS
+        SELECT
+            CASE WHEN i % 3 = 0 THEN 'green' ELSE 'yellow' END AS taxi_type,
+            2 + sin(i / 5000) + random() AS trip_co2_kgs,
+            CAST(i % 24 AS TINYINT) AS hour_of_day,
+            CAST(i % 7 AS TINYINT) AS day_of_week,
+            CAST(i // 4000 % 52 + 1 AS TINYINT) AS week_of_year,
+            CAST(i // 20000 % 12 + 1 AS TINYINT) AS month_of_year
+        FROM range(240000) AS t(i);
+    """)
+    groups = [(t, grain) for t in ("yellow", "green") for grain in ["year", *analysis.GRAINS]]
+    exact = analysis.approx_co2_rollup(con, 100)
+    assert not exact["half_width"].any()
+    assert not any(
+        ambiguous for group in groups if group[1] != "year"
+        for _, ambiguous in analysis.approx_heavy_and_light(exact, *group)
+    )
+    exact = {group: dict(zip(*analysis.rollup_series(exact, *group, "avg_kg"))) for group in groups}
+
+    covered = total = 0
+    for _ in range(30):
+        estimates = analysis.approx_co2_rollup(con, 20)
+        for group in groups:
+            periods, avg_kg, half_width = analysis.rollup_series(estimates, *group, "avg_kg", "half_width")
+            for period, avg, half in zip(periods, avg_kg, half_width):
+                if not np.isnan(half):
+                    covered += abs(avg - exact[group][period]) <= half
+                    total += 1
+    assert total > 1000
+    # ~0.94 in practice: intervals from one sample are correlated, so leave room for chance
+    assert covered / total >= 0.85
@@ -0,0 +1,79 @@
+import os
+
+import duckdb
+
+import clean
+from conftest import load_months
+
+MONTH = "2024-03"
+
+def kept_rows(con, mode, taxi_types):
+    """Rows a dedup mode keeps from the raw month, sorted"""
+    return con.execute(f"""
+        SELECT * EXCLUDE (copies, reject_rule) FROM ({clean.batch_sql(mode)})
+        WHERE reject_rule IS NULL
+        ORDER BY ALL;
+    """, [MONTH, taxi_types]).fetchall()
+
+def report(con, mode, taxi_types):
+    """cleaning_report row of the raw month for a dedup mode"""
+    con.execute(f"CREATE OR REPLACE TEMP TABLE batch AS {clean.batch_sql(mode)};", [MONTH, taxi_types])
+    return con.execute(f"{clean.report_sql('batch')};", [MONTH, taxi_types]).fetchall()
+
+def write_month(con, synthetic_dir, out_dir, copies):
+    """Yellow MONTH of the synthetic data plus `copies`, a query over it (src), as a new source file"""
+    name = f"yellow_tripdata_{MONTH}.parquet"
+    con.execute(f"""
+        COPY (
+            WITH src AS (SELECT * FROM read_parquet('{os.path.join(synthetic_dir, name)}'))
+            SELECT * FROM src
+            UNION ALL ({copies})
+        ) TO '{os.path.join(out_dir, name)}' (FORMAT parquet);
+    """)
+
+def test_key_dedup_keeps_the_same_rows_as_distinct(con, synthetic_dir, tmp_path):
+    # exact copies, and copies differing only in source columns the trips table doesn't load:
+    # both are duplicates by trip key and by DISTINCT * over the trips table
+    write_month(con, synthetic_dir, tmp_path, """
+        (SELECT * FROM src LIMIT 5)
+        UNION ALL
+        (SELECT * REPLACE (tip_amount + 1 AS tip_amount, total_amount + 1 AS total_amount) FROM src LIMIT 10)
+    """)
+    load_months(con, str(tmp_path), [MONTH], ["yellow"])
+
+    distinct_rows = kept_rows(con, "distinct", ["yellow"])
+    assert distinct_rows == kept_rows(con, "key", ["yellow"])
+    assert report(con, "distinct", ["yellow"])[0][2:-1] == report(con, "key", ["yellow"])[0][2:-1]
+    duplicates, rows_out = report(con, "key", ["yellow"])[0][7:9]
+    assert rows_out == len(distinct_rows)
+    assert duplicates > 0
+
+def test_key_dedup_merges_copies_that_differ_outside_the_key(con, synthetic_dir, tmp_path):
+    # a re-sent trip with another store_and_fwd_flag: one trip by key, two rows by DISTINCT *
+    write_month(con, synthetic_dir, tmp_path, """
+        SELECT * REPLACE (CASE WHEN store_and_fwd_flag = 'Y' THEN 'N' ELSE 'Y' END AS store_and_fwd_flag)
+        FROM src
+        WHERE passenger_count > 0 AND trip_distance BETWEEN 0.1 AND 100
+            AND date_diff('second', tpep_pickup_datetime, tpep_dropoff_datetime) <= 86400
+        LIMIT 3
+    """)
+    load_months(con, str(tmp_path), [MONTH], ["yellow"])
+
+    assert len(kept_rows(con, "distinct", ["yellow"])) == len(kept_rows(con, "key", ["yellow"])) + 3
+
+def test_clean_month_keeps_the_same_trips_in_both_modes(synthetic_dir, tmp_path, monkeypatch):
+    # 'key' deletes duplicate and rejected rows in place, 'distinct' rewrites the month
+    write_month(duckdb.connect(), synthetic_dir, tmp_path, "SELECT * FROM src LIMIT 20")
+    results = []
+    for mode in ("distinct", "key"):
+        con = duckdb.connect()
+        load_months(con, str(tmp_path), [MONTH], ["yellow"])
+        clean.create_cleaning_report(con)
+        monkeypatch.setattr(clean, "DEDUP_MODE", mode)
+        clean.clean_month(con, MONTH, ["yellow"])
+        results.append((
+            con.execute(f"SELECT * FROM {clean.TRIPS_TABLE} ORDER BY ALL;").fetchall(),
+            con.execute("SELECT * EXCLUDE (cleaned_at) FROM cleaning_report;").fetchall(),
+        ))
+    assert results[0] == results[1]
+    assert results[1][1][0][7] > 0
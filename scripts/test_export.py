@@ -0,0 +1,54 @@
+import duckdb
+import pytest
+
+import export
+import load
+
+@pytest.fixture
+def transformed(tmp_path, monkeypatch):
+    """trips_transformed of two fleets and months in random pickup order, on 8 threads"""
+    monkeypatch.setattr(export, "EXPORT_DIR", str(tmp_path / "trips"))
+    monkeypatch.setattr(export, "ROW_GROUP_SIZE", 16384)
+    con = duckdb.connect()
+    con.execute("SET threads = 8; SET preserve_insertion_order = false;")
+    load.create_manifest(con)
+    con.execute(f"""
+        SELECT setseed(0.7);
+        CREATE TABLE {export.TRANSFORMED} AS
+        SELECT
+            CASE WHEN i % 2 = 0 THEN 'yellow' ELSE 'green' END AS taxi_type,
+            m AS source_month,
+            CAST(m || '-01' AS TIMESTAMP) + INTERVAL (CAST(random() * 2400000 AS BIGINT)) SECOND AS pickup_datetime,
+            random() * 5 AS trip_co2_kgs
+        FROM range(400000) AS t(i), (VALUES ('2024-01'), ('2024-02')) AS months(m)
+        ORDER BY random();
+        INSERT INTO load_manifest (taxi_type, source_month, transformed_at)
+        SELECT DISTINCT taxi_type, source_month, now() FROM {export.TRANSFORMED};
+    """)
+    yield con
+    con.close()
+
+def test_export_files_are_sorted_by_pickup_time(transformed):
+    assert export.export_parquet_files(transformed)
+    files = transformed.execute(f"""
+        SELECT file_name, list(
+            [stats_min_value, stats_max_value] ORDER BY row_group_id
+        )
+        FROM parquet_metadata('{export.EXPORT_DIR}/*/*/*/*.parquet')
+        WHERE path_in_schema = 'pickup_datetime'
+        GROUP BY file_name;
+    """).fetchall()
+    assert len(files) == 4
+    for name, row_groups in files:
+        assert len(row_groups) > 1
+        # each row group starts after the previous one ends, so readers can skip by range
+        for (_, previous_max), (next_min, _) in zip(row_groups, row_groups[1:]):
+            assert previous_max <= next_min, name
+
+    exported = transformed.execute(f"""
+        SELECT taxi_type, year, month, COUNT(*)
+        FROM read_parquet('{export.EXPORT_DIR}/*/*/*/*.parquet', hive_partitioning = true)
+        GROUP BY ALL ORDER BY ALL;
+    """).fetchall()
+    assert exported == [("green", 2024, 1, 200000), ("green", 2024, 2, 200000),
+                        ("yellow", 2024, 1, 200000), ("yellow", 2024, 2, 200000)]
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+import od_matrix
+import transform
+from conftest import prepare_months, reload_month
+
+MONTHS = ["2024-01", "2024-02"]
+
+@pytest.fixture
+def od_path(tmp_path, monkeypatch):
+    """Matrix and state files in tmp_path"""
+    monkeypatch.setattr(od_matrix, "OD_PATH", str(tmp_path / "od.npy"))
+    monkeypatch.setattr(od_matrix, "STATE_PATH", str(tmp_path / "od.json"))
+    return od_matrix.OD_PATH
+
+def assert_matches_trips(con, path):
+    """Every metric of every fleet and month of the matrix sums to the transformed trips'"""
+    od = od_matrix.ODMatrix(path)
+    rows = con.execute(f"""
+        SELECT CAST(taxi_type AS VARCHAR), source_month, SUM(trip_co2_kgs), COUNT(*), SUM(trip_distance)
+        FROM {od_matrix.TRANSFORMED}
+        WHERE pu_location_id IS NOT NULL AND do_location_id IS NOT NULL
+        GROUP BY ALL;
+    """).fetchall()
+    assert rows
+    for taxi_type, month, *totals in rows:
+        for metric, total in zip(od_matrix.METRICS, totals):
+            assert od.matrix(metric, [taxi_type], [month]).sum() == pytest.approx(total)
+    assert od.matrix("trips").sum() == sum(trips for *_, trips, _ in rows)
+
+def test_od_matrix_totals_match_the_transformed_trips(db, synthetic_dir, tmp_path, od_path):
+    src = str(tmp_path / "src")
+    prepare_months(db, synthetic_dir, src, MONTHS)
+    assert transform.transform_trips(db)
+    assert od_matrix.build_od_matrix(db)
+    assert_matches_trips(db, od_path)
+
+    # a reloaded month is rebuilt in place, the others are left as they were
+    before = od_matrix.ODMatrix(od_path).by_month("trips", ["green"])
+    reload_month(db, src, "yellow", "2024-02", 40)
+    assert transform.transform_trips(db)
+    assert od_matrix.pending_months(db, od_matrix.read_state()).keys() == {"yellow/2024-02"}
+    assert od_matrix.build_od_matrix(db)
+    assert_matches_trips(db, od_path)
+    after = od_matrix.ODMatrix(od_path).by_month("trips", ["green"])
+    assert all(np.array_equal(before[month], after[month]) for month in od_matrix.MONTHS)
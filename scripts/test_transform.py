@@ -0,0 +1,85 @@
+import transform
+from conftest import prepare_months, reload_month
+
+MONTHS = ["2024-01", "2024-02", "2024-03"]
+
+def transformed_at(con):
+    """{'taxi_type/YYYY-MM': transformed_at} from load_manifest"""
+    return dict(con.execute("""
+        SELECT taxi_type || '/' || source_month, transformed_at FROM load_manifest;
+    """).fetchall())
+
+def month_counts(con, table):
+    """{(taxi_type, source_month): rows} of a trips table"""
+    return dict(((t, m), n) for t, m, n in con.execute(f"""
+        SELECT CAST(taxi_type AS VARCHAR), source_month, COUNT(*) FROM {table} GROUP BY ALL;
+    """).fetchall())
+
+def test_transform_only_rebuilds_reloaded_months(db, synthetic_dir, tmp_path):
+    src = str(tmp_path / "src")
+    prepare_months(db, synthetic_dir, src, MONTHS)
+    assert transform.transform_trips(db)
+    first = transformed_at(db)
+    assert all(first.values())
+    assert month_counts(db, "trips_transformed") == month_counts(db, "trips")
+
+    # a smaller yellow 2024-02 file is reloaded and cleaned: only that month is transformed again
+    reload_month(db, src, "yellow", "2024-02", 40)
+    assert transform.transform_trips(db)
+
+    second = transformed_at(db)
+    assert {month for month in second if second[month] != first[month]} == {"yellow/2024-02"}
+    assert month_counts(db, "trips_transformed") == month_counts(db, "trips")
+    assert month_counts(db, "trips_transformed")[("yellow", "2024-02")] <= 40
+
+def factor_prices(con):
+    """(taxi_type, rows, rows priced at trip_distance * <factor column> / 1000) of trips_transformed"""
+    return con.execute("""
+        SELECT CAST(t.taxi_type AS VARCHAR), COUNT(*),
+            COUNT(*) FILTER (WHERE abs(t.trip_co2_kgs - CAST(t.trip_distance AS DOUBLE) * f.co2_grams_per_mile / 1000.0) < 1e-9),
+            COUNT(*) FILTER (WHERE abs(t.trip_co2_kgs - CAST(t.trip_distance AS DOUBLE) * f.co2_grams_per_mile_city / 1000.0) < 1e-9)
+        FROM trips_transformed AS t
+        JOIN emission_factors AS f USING (vehicle_type)
+        GROUP BY ALL ORDER BY ALL;
+    """).fetchall()
+
+def test_changed_emission_factors_reprice_every_month(db, synthetic_dir, tmp_path):
+    prepare_months(db, synthetic_dir, str(tmp_path / "src"), MONTHS)
+    assert transform.transform_trips(db)
+    first = transformed_at(db)
+
+    # a new CSV factor for yellow: nothing was cleaned again, but every month is repriced
+    db.execute("UPDATE vehicle_emissions SET co2_grams_per_mile = 500 WHERE vehicle_type = 'yellow_taxi';")
+    assert transform.transform_trips(db)
+    second = transformed_at(db)
+    assert all(second[month] > first[month] for month in first)
+    assert all(rows == combined for _, rows, combined, _ in factor_prices(db))
+    assert db.execute("SELECT DISTINCT co2_grams_per_mile FROM emission_factors WHERE vehicle_type = 'yellow_taxi';").fetchall() == [(500,)]
+
+    # unchanged factors: nothing to do
+    assert transform.transform_trips(db)
+    assert transformed_at(db) == second
+
+def test_reprice_and_full_refresh_restamp_every_month(db, synthetic_dir, tmp_path):
+    from dbt.cli.main import dbtRunner
+
+    prepare_months(db, synthetic_dir, str(tmp_path / "src"), MONTHS)
+    assert transform.transform_trips(db)
+    first = transformed_at(db)
+
+    result = dbtRunner().invoke([
+        "run-operation", "reprice_trip_co2", "--project-dir", transform.DBT_DIR,
+        "--profiles-dir", transform.DBT_DIR, "--args", "{basis: city}",
+    ])
+    assert result.success
+    repriced = transformed_at(db)
+    assert all(repriced[month] > first[month] for month in first)
+    assert all(rows == city for _, rows, _, city in factor_prices(db))
+
+    # the next run with the same basis has nothing to do, the default basis reprices again
+    transform.dbt_run("--vars", "{co2_factor_basis: city}")
+    assert transformed_at(db) == repriced
+    transform.dbt_run("--full-refresh")
+    refreshed = transformed_at(db)
+    assert all(refreshed[month] > repriced[month] for month in first)
+    assert all(rows == combined for _, rows, combined, _ in factor_prices(db))
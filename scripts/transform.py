@@ -3,8 +3,101 @@ I completed all the transformations in dbt models instead of a python script.
 
 Saved in dbt/models/:
 
-- yellow_trips_2024_transformed.sql
-- green_trips_2024_transformed.sql
+- trips_transformed.sql (trips of every configured year and fleet, one row per trip with a taxi_type column)
+- emission_factors.sql (CO2 factor per vehicle type, joined at pickup time)
+- co2_cube_hourly.sql (CO2 per taxi type, pickup date and hour, served by serve.py)
 
-Each model adds trip_co2_kgs, avg_mph, hour_of_day, day_of_week, week_of_year columns.
-"""
\ No newline at end of file
+The trips model adds trip_co2_kgs, avg_mph, hour_of_day, day_of_week, week_of_year columns.
+
+It is materialized as an incremental table keyed on taxi_type and source_month (the
+pickup file month): a run only rebuilds the months load_manifest marks as cleaned since
+they were last transformed, replacing just those months' rows.
+
+Run from the repository root:
+    dbt run --project-dir dbt --profiles-dir dbt
+
+or with this script, which runs dbt in process and, when the memory budget is small
+(see resources.py), runs it once per pending month:
+    python scripts/transform.py
+"""
+import json
+import logging
+import os
+
+import instrument
+import resources
+
+logger = logging.getLogger(__name__)
+
+# dbt project (and profiles) directory; DBT_PROJECT_DIR is also what dbt itself reads
+DBT_DIR = os.environ.get("DBT_PROJECT_DIR", "dbt")
+
+def dbt_run(*args):
+    """
+    dbt run in this process. dbt-duckdb opens emissions.duckdb with the same settings,
+    so DuckDB hands it the database instance (and warm buffer pool) already open here.
+    """
+    from dbt.cli.main import dbtRunner
+
+    result = dbtRunner().invoke(["run", "--project-dir", DBT_DIR, "--profiles-dir", DBT_DIR, *args])
+    if not result.success:
+        raise RuntimeError(f"dbt run failed: {result.exception or 'see dbt/logs/dbt.log'}")
+
+def pending_months(con):
+    """
+    Months cleaned since they were last transformed or priced with other factors than the
+    emission_factors table's, as (['taxi_type/YYYY-MM', ...], rows) per month
+    """
+    return con.execute("""
+        SELECT list(taxi_type || '/' || source_month ORDER BY taxi_type), SUM(row_count)
+        FROM load_manifest
+        WHERE cleaned_at IS NOT NULL AND (
+            transformed_at IS NULL OR transformed_at < cleaned_at
+            OR factor_version IS DISTINCT FROM (SELECT any_value(factor_version) FROM emission_factors)
+        )
+        GROUP BY source_month
+        ORDER BY source_month;
+    """).fetchall()
+
+def transform_trips(con=None):
+    """
+    Build the dbt models: emission_factors first, then one dbt run, or when the pending
+    months have too many rows for the memory budget, one dbt run per month (all taxi
+    types), passing the month in the transform_months var, and a last one building
+    co2_cube_hourly.
+    Returns True if the transform succeeded.
+    """
+    try:
+        if con is None:
+            # Connect to local DuckDB instance
+            con = instrument.connect("transform", database='emissions.duckdb', read_only=False)
+            logger.info("Connected to DuckDB instance")
+
+        # the factor version pending_months compares against
+        dbt_run("--select", "emission_factors")
+        months = pending_months(con)
+        if not resources.chunked(con, sum(rows for _, rows in months)):
+            dbt_run("--exclude", "emission_factors")
+        else:
+            print(f"Transforming {len(months)} months one at a time to stay within the memory budget")
+            logger.info(f"Transforming {len(months)} months one at a time to stay within the memory budget")
+            for month, _ in months:
+                # co2_cube_hourly only needs building once, at the end
+                dbt_run("--vars", json.dumps({"transform_months": month}), "--select", "trips_transformed")
+                logger.info(f"Transformed {', '.join(month)}")
+            dbt_run("--select", "co2_cube_hourly")
+        return True
+
+    except Exception as e:
+        print(f"An error occurred: {e}")
+        logger.error(f"An error occurred: {e}")
+        return False
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s',
+        filename='logs/transform.log'
+    )
+    transform_trips()
+    print("Data transformation complete.")
+    logger.info("Data transformation complete.")